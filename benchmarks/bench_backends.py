@@ -0,0 +1,77 @@
+"""Compares the ipywidgets and anywidget form backends on render time and memory.
+
+uv run python benchmarks/bench_backends.py --fields 500
+"""
+
+import argparse
+import time
+import tracemalloc
+import warnings
+
+import ipywidgets as w
+
+from ipyform import parser
+from ipyform.anywidget_form import AnyFormWidget
+from ipyform.widgets import FormWidget
+
+
+def make_cell(n: int) -> str:
+    lines = ["# @title Benchmark"]
+    for i in range(n):
+        if i % 50 == 0:
+            lines.append(f"# @markdown ### Section {i // 50}")
+        lines.append(
+            [
+                f"a{i} = {i} # @param {{type: 'integer'}}",
+                f"a{i} = 'x' # @param ['x', 'y', 'z']",
+                f"a{i} = 0.5 # @param {{type: 'slider', min: 0, max: 1, step: 0.1}}",
+                f"a{i} = True # @param {{type: 'boolean'}}",
+            ][i % 4]
+        )
+    return "\n".join(lines)
+
+
+def n_models() -> int:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        return len(w.Widget.widgets)
+
+
+def measure(make, repeat: int) -> tuple[float, int, int]:
+    """Returns the best render time, the peak traced memory and the number of widget models."""
+    best = float("inf")
+    for _ in range(repeat):
+        before = n_models()
+        start = time.perf_counter()
+        widget = make()
+        best = min(best, time.perf_counter() - start)
+        created = n_models() - before
+        widget.close_all()
+
+    tracemalloc.start()
+    widget = make()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    widget.close_all()
+    return best, peak, created
+
+
+def main():
+    args = argparse.ArgumentParser()
+    args.add_argument("--fields", type=int, default=500)
+    args.add_argument("--repeat", type=int, default=5)
+    args = args.parse_args()
+
+    data = parser.parse(make_cell(args.fields))
+    backends = {
+        "ipywidgets": lambda: FormWidget(data, ns={}),
+        "anywidget": lambda: AnyFormWidget(data, ns={}),
+    }
+    print(f"{'backend':<12}{'render (ms)':>14}{'peak mem (KiB)':>16}{'models':>8}")
+    for name, make in backends.items():
+        t, peak, created = measure(make, args.repeat)
+        print(f"{name:<12}{t * 1000:>14.1f}{peak / 1024:>16.0f}{created:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compares `parser.parse_many` with a loop over `parser.parse` on a large notebook.
+
+uv run python benchmarks/bench_parse.py --cells 5000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from ipyform import parser
+
+OPTIONS = ", ".join(f"'option {i}'" for i in range(50))
+
+
+def make_cells(n: int, form_ratio: float) -> list[str]:
+    """Code cells, and form cells repeating the same annotations."""
+    cells = []
+    for i in range(n):
+        if i % round(1 / form_ratio) == 0:
+            cells.append(
+                "\n".join(
+                    [
+                        f"# @title Step {i}",
+                        f"model = 'option 1' # @param [{OPTIONS}]",
+                        "lr = 0.1 # @param {type: 'slider', min: 0, max: 1, step: 0.1}",
+                        "epochs = 10 # @param {type: 'integer'}",
+                        "# @markdown ### Data",
+                        "path = 'data.csv' # @param {type: 'string'}",
+                        "train(model, lr, epochs, path)",
+                    ]
+                )
+            )
+        else:
+            cells.append(
+                "\n".join(f"x{j} = compute(x{j - 1}, {i}) # step {j}" for j in range(1, 15))
+            )
+    return cells
+
+
+def measure(fn, repeat: int) -> tuple[float, int]:
+    """Returns the best time, and the traced memory of the returned forms."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    forms = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del forms
+    return best, size
+
+
+def main():
+    args = argparse.ArgumentParser()
+    args.add_argument("--cells", type=int, default=5000)
+    args.add_argument("--form-ratio", type=float, default=0.2)
+    args.add_argument("--repeat", type=int, default=3)
+    args = args.parse_args()
+
+    cells = make_cells(args.cells, args.form_ratio)
+    runs = {
+        "parse loop": lambda: [parser.parse(c) for c in cells],
+        "parse_many": lambda: list(parser.parse_many(cells)),
+    }
+    print(f"{'':<12}{'time (ms)':>12}{'forms mem (KiB)':>18}")
+    for name, fn in runs.items():
+        t, size = measure(fn, args.repeat)
+        print(f"{name:<12}{t * 1000:>12.1f}{size / 1024:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
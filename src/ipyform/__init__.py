@@ -1,5 +1,10 @@
 from importlib.metadata import version
 
-from ipyform.ipython_ext import load_ipython_extension  # noqa: F401
-
 __version__ = version("ipyform")
+
+
+def load_ipython_extension(ipython):
+    # Imported lazily, so that batch tools using the parser or the specs don't load ipywidgets
+    from ipyform.ipython_ext import load_ipython_extension
+
+    load_ipython_extension(ipython)
@@ -0,0 +1,271 @@
+"""Single-model form backend.
+
+`FormWidget` creates one ipywidgets model per field. `AnyFormWidget` renders the whole form
+as one anywidget model: the layout is sent once as a JSON description, and the frontend sends
+back value deltas in a single message.
+"""
+
+import threading
+import uuid
+from datetime import date
+from typing import Any, Optional
+
+import ipywidgets as w
+import markdown
+import traitlets as t
+
+from ipyform import env
+from ipyform.codegen import format_value, split_sections
+from ipyform.entities import Form, Param
+from ipyform.isolate import Isolation
+from ipyform.output import OutputMode
+from ipyform.providers import OptionProvider, get_provider
+from ipyform.scheduler import SCHEDULER
+from ipyform.specs import NATIVE_TYPES, FieldSpec, form_specs, native_value
+from ipyform.widgets import (
+    BaseFormWidget,
+    RerunPolicy,
+    collapse_code,
+    title_html,
+)
+
+try:
+    import anywidget
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        "The anywidget backend requires `anywidget`. Install it with `pip install anywidget`."
+    ) from e
+
+
+KINDS = {
+    "Dropdown": "dropdown",
+    "Combobox": "combobox",
+    "FloatSlider": "slider",
+    "IntSlider": "slider",
+    "IntText": "int",
+    "FloatText": "float",
+    "Checkbox": "checkbox",
+    "DatePicker": "date",
+    "Text": "text",
+}
+
+
+def spec_to_json(spec: FieldSpec) -> dict:
+    """Describes the input element of a field for the frontend."""
+    out = {"variable": spec.variable, "kind": KINDS[spec.widget]}
+    for k in ("value", "options", "min", "max", "step", "placeholder"):
+        if k in spec.kwargs:
+            out[k] = list(spec.kwargs[k]) if k == "options" else spec.kwargs[k]
+    return out
+
+
+def form_to_json(data: Form, col: int = 1) -> dict:
+    """Describes the whole form for the frontend: title, then one entry per section.
+
+    Dropdowns with a source only list their value. Their options are sent once loaded.
+    """
+    specs = {id(p): spec for p, spec in zip(data.params, form_specs(data))}
+    sections = []
+    for params, md in split_sections(data):
+        sections.append(
+            {
+                "fields": [spec_to_json(specs[id(p)]) for p in params],
+                "markdown": markdown.markdown(md.text) if md is not None else None,
+            }
+        )
+    return {
+        "title": title_html(data.title) if data.title else None,
+        "col": col,
+        "toggle_id": None if env.IN_VSCODE else "a" + str(uuid.uuid1())[:8],
+        "sections": sections,
+    }
+
+
+class FormModel(anywidget.AnyWidget):
+    _esm = """
+    function input(field, send) {
+      let el;
+      if (field.kind === "dropdown") {
+        el = document.createElement("select");
+        for (const o of field.options) {
+          const opt = document.createElement("option");
+          opt.value = opt.textContent = o;
+          el.appendChild(opt);
+        }
+      } else {
+        el = document.createElement("input");
+        el.type = {checkbox: "checkbox", date: "date", slider: "range", int: "number", float: "number"}[field.kind] || "text";
+        if (field.kind === "float") el.step = "any";
+        if (field.kind === "combobox") {
+          const list = document.createElement("datalist");
+          list.id = "l" + Math.random().toString(36).slice(2);
+          for (const o of field.options) {
+            const opt = document.createElement("option");
+            opt.value = o;
+            list.appendChild(opt);
+          }
+          el.setAttribute("list", list.id);
+          el._list = list;
+        }
+        if (field.kind === "slider") Object.assign(el, {min: field.min, max: field.max, step: field.step});
+        if (field.placeholder) el.placeholder = field.placeholder;
+      }
+      if (field.kind === "checkbox") el.checked = field.value;
+      else el.value = field.value;
+      el.addEventListener("change", () => {
+        let v = el.value;
+        if (field.kind === "checkbox") v = el.checked;
+        if (["slider", "int", "float"].includes(field.kind) && v !== "") v = Number(v);
+        send({[field.variable]: v});
+      });
+      return el;
+    }
+
+    function setOptions(el, options) {
+      const value = el.value;
+      (el._list || el).replaceChildren(...options.map((o) => {
+        const opt = document.createElement("option");
+        opt.value = o;
+        if (!el._list) opt.textContent = o;
+        return opt;
+      }));
+      el.value = value;
+    }
+
+    function render({ model, el }) {
+      const spec = model.get("spec");
+      const root = document.createElement("div");
+      if (spec.toggle_id) {
+        const btn = document.createElement("button");
+        btn.id = spec.toggle_id;
+        btn.textContent = "Hide/Show Code";
+        btn.onclick = () => window.code_toggle && window.code_toggle(spec.toggle_id);
+        root.appendChild(btn);
+      }
+      if (spec.title) root.insertAdjacentHTML("beforeend", spec.title);
+      const send = (values) => model.send({type: "update", values});
+      const inputs = {};
+      for (const section of spec.sections) {
+        if (section.fields.length || section.markdown === null) {
+          const grid = document.createElement("div");
+          grid.style.display = "grid";
+          grid.style.gridTemplateColumns = "auto ".repeat(spec.col);
+          for (const field of section.fields) {
+            const row = document.createElement("label");
+            row.style.width = "400px";
+            const desc = document.createElement("span");
+            desc.textContent = field.variable;
+            desc.style.display = "inline-block";
+            desc.style.width = "150px";
+            const el = input(field, send);
+            inputs[field.variable] = el;
+            row.append(desc, el);
+            if (el._list) row.append(el._list);
+            grid.appendChild(row);
+          }
+          root.appendChild(grid);
+        }
+        if (section.markdown !== null) root.insertAdjacentHTML("beforeend", section.markdown);
+      }
+      el.appendChild(root);
+      const loaded = () => {
+        for (const [variable, options] of Object.entries(model.get("options"))) {
+          if (inputs[variable]) setOptions(inputs[variable], options);
+        }
+      };
+      loaded();
+      model.on("change:options", loaded);
+    }
+    export default { render };
+    """
+
+    spec = t.Dict().tag(sync=True)
+    options = t.Dict().tag(sync=True)  # variable -> options loaded from its source
+
+
+class AnyFormWidget(BaseFormWidget):
+    """Same behavior as `FormWidget`, but the fields live in a single anywidget model."""
+
+    def __init__(
+        self,
+        data: Form,
+        ns: dict = globals(),
+        col: int = 1,
+        output_mode: OutputMode = "full",
+        max_output_lines: int = 200,
+        rerun: RerunPolicy = "on-change",
+        idle_delay: float = 1.0,
+        isolation: Optional[Isolation] = None,
+        profile: bool = False,
+    ):
+        self._setup(data, ns, output_mode, max_output_lines, rerun, idle_delay, isolation, profile)
+        self.values = {p.variable: p.value for p in data.params}
+        self.params = {p.variable: p for p in data.params}
+        self.native = {s.variable for s in form_specs(data) if s.widget in NATIVE_TYPES}
+        self.model = FormModel(spec=form_to_json(data, col=col))
+        self.model.on_msg(self._on_msg)
+        providers = {
+            s.variable: provider
+            for s in form_specs(data)
+            if s.source and (provider := get_provider(s.source, ns))
+        }
+        # The first page of the sources is loaded in the background, like in `LazyOptions`
+        self.options_thread = None
+        if any(not p.options and not p.exhausted for p in providers.values()):
+            self.options_thread = threading.Thread(
+                target=self._load_options, args=(providers,), daemon=True
+            )
+            self.options_thread.start()
+        elif providers:
+            self._load_options(providers)
+
+        toolbar = [self.toolbar] if self.toolbar is not None else []
+        profile_view = [self.profile_view] if self.profile_view is not None else []
+        children = [self.model, *toolbar, self.message, self.output, *profile_view]
+        super().__init__([w.VBox(children)])
+        self._rerun(None)
+        toggle_id = self.model.spec["toggle_id"]
+        if data.display_mode == "form" and toggle_id:
+            collapse_code(toggle_id)
+
+    def code_values(self) -> dict[str, str]:
+        return {
+            v: format_value(p, self._from_json(p, self.values[v]))
+            for v, p in self.params.items()
+            if v not in self.native
+        }
+
+    def native_values(self) -> dict[str, Any]:
+        return {v: native_value(self.params[v], self.values[v]) for v in self.native}
+
+    def update_values(self, values: dict):
+        """Applies a value delta. If all values are valid, reruns the cell per the rerun policy."""
+        values = {k: v for k, v in values.items() if k in self.params}
+        self.values.update(values)
+        SCHEDULER.focus(self)
+        if self.validate(values):
+            self._changed(values)
+
+    def close(self):
+        if self.comm is not None:
+            self.model.on_msg(self._on_msg, remove=True)
+        super().close()
+
+    def _load_options(self, providers: dict[str, OptionProvider]):
+        for variable, provider in providers.items():
+            options = provider.options or provider.fetch_page()
+            value = str(self.values[variable])
+            options = ([value] if value not in options else []) + options
+            if self.model.comm is None:  # closed meanwhile
+                return
+            self.model.options = {**self.model.options, variable: options}
+
+    def _on_msg(self, _, content, buffers):
+        if content.get("type") == "update":
+            self.update_values(content["values"])
+
+    @staticmethod
+    def _from_json(p: Param, v):
+        if p.var_type == "date" and isinstance(v, str):
+            return date.fromisoformat(v)
+        return v
@@ -0,0 +1,45 @@
+from typing import Iterable, Optional
+
+from ipyform.entities import Form, Markdown, Param
+
+
+def format_value(p: Param, v) -> str:
+    """Formats a widget value as the python expression assigned to the param variable."""
+    typ = p.var_type
+    if typ in ("boolean", "number", "integer", "raw"):
+        return str(v)
+    elif typ == "date":
+        return f'"{v.isoformat()}"'
+    elif typ == "string":
+        return f'"""{v}"""'
+    else:  # pragma: no cover
+        raise ValueError(f"Unknown type: {typ}")
+
+
+def build_code(form: Form, values: dict[str, str], native: Iterable[str] = ()) -> str:
+    """Rebuilds the cell code, replacing the line of each param found in `values`.
+
+    Lines of the `native` variables are blanked: their value is set in the namespace by the
+    caller before the run.
+    """
+    codes = list(form.code)
+    native = set(native)
+    for p in form.params:
+        if p.variable in native:
+            codes[p.lineno - 1] = ""
+        elif p.variable in values:
+            codes[p.lineno - 1] = f"{p.variable} = {values[p.variable]}"
+    return "\n".join(codes)
+
+
+def split_sections(data: Form) -> list[tuple[list[Param], Optional[Markdown]]]:
+    """Groups params by the markdown line that closes their section.
+
+    The last section has no closing markdown and is always present, even when empty.
+    """
+    out, i_prev = [], 0
+    for md in data.markdowns:
+        out.append(([p for p in data.params if i_prev <= p.lineno < md.lineno], md))
+        i_prev = md.lineno
+    out.append(([p for p in data.params if p.lineno >= i_prev], None))
+    return out
@@ -0,0 +1,59 @@
+"""Structural diff of two versions of a form, to update a rendered form in place.
+
+Params are matched by variable name. A variable assigned several times is matched in line
+order. Params that only moved (e.g. a line was inserted above) are unchanged.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+
+from ipyform.codegen import split_sections
+from ipyform.entities import Form, Param
+
+# Param attributes that don't change the field
+_POSITION = ("code", "lineno")
+
+
+@dataclass
+class FormDiff:
+    kept: list[tuple[Param, Param]] = field(default_factory=list)  # (old, new)
+    changed: list[tuple[Param, Param]] = field(default_factory=list)  # (old, new)
+    added: list[Param] = field(default_factory=list)
+    removed: list[Param] = field(default_factory=list)
+    layout_changed: bool = False  # title, markdowns or order of the params
+
+    @property
+    def empty(self) -> bool:
+        return not (self.changed or self.added or self.removed or self.layout_changed)
+
+
+def same_field(a: Param, b: Param) -> bool:
+    """Returns True when the params only differ by their position in the code."""
+    return all(
+        getattr(a, f.name) == getattr(b, f.name) for f in fields(Param) if f.name not in _POSITION
+    )
+
+
+def diff_forms(old: Form, new: Form) -> FormDiff:
+    d = FormDiff()
+    old_by_name = defaultdict(list)
+    for p in old.params:
+        old_by_name[p.variable].append(p)
+    for p in new.params:
+        if old_by_name[p.variable]:
+            prev = old_by_name[p.variable].pop(0)
+            (d.kept if same_field(prev, p) else d.changed).append((prev, p))
+        else:
+            d.added.append(p)
+    d.removed = [p for ps in old_by_name.values() for p in ps]
+    d.layout_changed = (
+        old.title != new.title
+        or [m.text for m in old.markdowns] != [m.text for m in new.markdowns]
+        or _sections(old) != _sections(new)
+    )
+    return d
+
+
+def _sections(form: Form) -> list[list[str]]:
+    """Variables of each section, in order."""
+    return [[p.variable for p in params] for params, _ in split_sections(form)]
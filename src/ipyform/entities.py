@@ -1,7 +1,7 @@
 import dataclasses
 from dataclasses import dataclass
 from operator import attrgetter
-from typing import List, Literal, Optional, Union
+from typing import List, Literal, Optional, Tuple, Union
 
 
 @dataclass(repr=False)
@@ -13,8 +13,9 @@ class Param:
     variable: str
     value: Union[int, float, str, bool, None]
 
-    options: Optional[List[str]] = None
+    options: Optional[Tuple[str, ...]] = None  # interned, see `ipyform.options`
     allow_input: bool = False
+    source: Optional[str] = None  # name of the options provider
 
     min: Optional[float] = None
     max: Optional[float] = None
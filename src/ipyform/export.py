@@ -0,0 +1,156 @@
+"""Static HTML export of forms, for notebooks viewed without a kernel.
+
+Params are rendered as plain HTML inputs. Outputs can be precomputed for a bounded set of
+param combinations (see `ipyform.sweep`): viewers then change the values client-side and see
+the output of the matching run. Identical outputs are stored once.
+"""
+
+import html
+import itertools
+import json
+import uuid
+from typing import Iterable, Iterator, Literal, Optional
+
+import markdown
+
+from ipyform.codegen import format_value, split_sections
+from ipyform.entities import Form, Param
+from ipyform.sweep import SweepResult, grid, param_domain, run_sweep
+from ipyform.widgets import title_html
+
+MAX_RUNS = 64
+MISSING = "<em>No precomputed output for these values.</em>"
+
+
+def combinations(form: Form) -> Iterator[dict[str, str]]:
+    """Yields the current values of the form first, then the rest of the grid."""
+    current = {p.variable: param_domain(p)[_initial(p)] for p in form.params}
+    yield current
+    yield from (values for values in grid(form) if values != current)
+
+
+def precompute(
+    form: Form,
+    ns: Optional[dict] = None,
+    max_runs: int = MAX_RUNS,
+    executor: Literal["thread", "process"] = "thread",
+    workers: int = 4,
+    timeout: Optional[float] = None,
+) -> list[SweepResult]:
+    """Runs the cell for at most `max_runs` combinations, starting with the current values."""
+    runs = itertools.islice(combinations(form), max_runs)
+    return list(run_sweep(form, runs, ns=ns, executor=executor, workers=workers, timeout=timeout))
+
+
+def export_html(form: Form, results: Iterable[SweepResult] = (), col: int = 1) -> str:
+    """Renders the form as standalone html, with the outputs of `results`."""
+    uid = f"ipyform-{uuid.uuid4().hex[:8]}"
+    outputs: dict[str, int] = {}  # output html -> index, to store identical outputs once
+    index = {}
+    for r in results:
+        key = _key(form, r.values)
+        if key is not None:
+            index[key] = outputs.setdefault(result_html(r), len(outputs))
+
+    parts = [title_html(form.title)] if form.title else []
+    for params, md in split_sections(form):
+        if params:
+            fields = "".join(_field(p) for p in params)
+            # label and control of each field
+            grid_style = f"display: grid; grid-template-columns: {'auto ' * 2 * col}; gap: 4px"
+            parts.append(f'<div style="{grid_style}">{fields}</div>')
+        if md is not None:
+            parts.append(markdown.markdown(md.text))
+
+    if index:
+        current = _key(form, {p.variable: param_domain(p)[_initial(p)] for p in form.params})
+        initial = list(outputs)[index[current]] if current in index else MISSING
+        data = json.dumps({"outputs": list(outputs), "index": index}).replace("</", "<\\/")
+        parts.append(
+            f'<div class="ipyform-output">{initial}</div>'
+            f'<script type="application/json">{data}</script>'
+            f"<script>{SCRIPT % (json.dumps(uid), json.dumps(MISSING))}</script>"
+        )
+    return f'<div id="{uid}" class="ipyform-static">{"".join(parts)}</div>'
+
+
+def result_html(r: SweepResult) -> str:
+    """Renders the stdout, result and error of a run."""
+    text = r.output + (r.result + "\n" if r.result is not None else "")
+    out = f"<pre>{html.escape(text)}</pre>" if text else ""
+    if r.error is not None:
+        out += f'<pre style="color: red">{html.escape(r.error)}</pre>'
+    return out
+
+
+def _initial(p: Param) -> int:
+    """Index of the current value of the param in its domain."""
+    domain = param_domain(p)
+    if p.field_type == "slider":
+        return min(range(len(domain)), key=lambda i: abs(float(domain[i]) - p.value))
+    value = format_value(p, p.value)
+    return domain.index(value) if value in domain else 0
+
+
+def _key(form: Form, values: dict[str, str]) -> Optional[str]:
+    """Identifies a combination by the domain index of each param, as the script does."""
+    indices = []
+    for p in form.params:
+        domain = param_domain(p)
+        if values.get(p.variable) not in domain:
+            return None
+        indices.append(str(domain.index(values[p.variable])))
+    return ",".join(indices)
+
+
+def _field(p: Param) -> str:
+    domain = param_domain(p)
+    attrs = f'data-var="{p.variable}"' + (" disabled" if len(domain) == 1 else "")
+    i = _initial(p)
+    if p.field_type == "dropdown" and p.options is not None:
+        options = "".join(
+            f'<option value="{j}"{" selected" if j == i else ""}>{html.escape(o)}</option>'
+            for j, o in enumerate(p.options)
+        )
+        control = f"<select {attrs}>{options}</select>"
+    elif p.field_type == "slider":
+        labels = html.escape(json.dumps(domain))
+        control = (
+            f'<input type="range" min="0" max="{len(domain) - 1}" step="1" value="{i}" '
+            f'data-labels="{labels}" {attrs}> <span>{domain[i]}</span>'
+        )
+    elif p.var_type == "boolean":
+        # domain is ["True", "False"]
+        control = f'<input type="checkbox"{" checked" if i == 0 else ""} {attrs}>'
+    else:
+        value = html.escape(str(p.value))
+        control = f'<input type="text" value="{value}" {attrs}>'
+    return f"<label>{p.variable}</label>{control}"
+
+
+SCRIPT = """
+(function () {
+    var root = document.getElementById(%s);
+    var data = JSON.parse(root.querySelector("script[type='application/json']").textContent);
+    var output = root.querySelector(".ipyform-output");
+    var controls = root.querySelectorAll("[data-var]");
+    function index(el) {
+        if (el.type === "checkbox") return el.checked ? "0" : "1";
+        if (el.disabled) return "0";
+        return el.value;
+    }
+    function update() {
+        var key = Array.prototype.map.call(controls, index).join(",");
+        var i = data.index[key];
+        output.innerHTML = i === undefined ? %s : data.outputs[i];
+    }
+    controls.forEach(function (el) {
+        el.addEventListener("input", function () {
+            if (el.dataset.labels) {
+                el.nextElementSibling.textContent = JSON.parse(el.dataset.labels)[el.value];
+            }
+            update();
+        });
+    });
+})();
+"""
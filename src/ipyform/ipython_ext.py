@@ -1,22 +1,64 @@
+import gc
+import hashlib
+import itertools
 import logging
 import re
+import weakref
+from collections import OrderedDict
+from typing import Optional
 
-from IPython import InteractiveShell
-from IPython.core.magic import needs_local_scope, register_cell_magic, register_line_magic
+import ipywidgets as w
+from IPython import InteractiveShell, get_ipython
+from IPython.core.magic import (
+    needs_local_scope,
+    register_cell_magic,
+    register_line_magic,
+)
 from IPython.core.magic_arguments import argument, magic_arguments, parse_argstring
 from IPython.display import HTML, display
 
-from ipyform import env, parser
-from ipyform.widgets import FormWidget
+from ipyform import env, export, isolate, parser, sweep
+from ipyform.entities import Form
+from ipyform.scheduler import SCHEDULER
+from ipyform.widgets import (
+    BaseFormWidget,
+    FormWidget,
+    descendants,
+    live_forms,
+    state_size,
+)
 
 logger = logging.getLogger(__package__)
 
+# ipywidgets: one widget per field. anywidget: the whole form in a single widget.
+BACKENDS = ("ipywidgets", "anywidget")
+# full: all output is forwarded. bounded: only the last lines. last: also only the last display.
+OUTPUT_MODES = ("full", "bounded", "last")
+# on-change: rerun on each change. on-submit: with a Run button. on-idle: once changes stop.
+RERUN_POLICIES = ("on-change", "on-submit", "on-idle")
+
 
 CONFIG = {
     "col": 1,
     "auto_detect": False,
+    "backend": "ipywidgets",
+    "output": "full",
+    "max_lines": 200,
+    "rerun": "on-change",
+    "idle_delay": 1.0,
+    "include": None,  # regex: cells auto detected only if it matches
+    "exclude": None,  # regex: cells never auto detected if it matches
 }
 
+# Last form rendered by each cell, with its options. Updated in place when the cell is rerun,
+# closed when it is replaced.
+_FORMS: dict[str, tuple[tuple, weakref.ref]] = {}
+
+# Transform decision of the last cells, by hash of the cell and auto detect config
+DECISION_CACHE_SIZE = 4096
+_DECISIONS: "OrderedDict[tuple, Optional[int]]" = OrderedDict()
+_ADD_MAGIC = -1  # decision: add `%%form`. Otherwise the index of the `#! %%form` line, or None
+
 
 def load_ipython_extension(ipython: InteractiveShell):
     if env.IN_COLAB:
@@ -27,7 +69,10 @@ def load_ipython_extension(ipython: InteractiveShell):
     display(HTML(COLLAPSE_CODE_SCRIPT))
 
     register_line_magic(form_config)
+    register_line_magic(form_gc)
     register_cell_magic(form)
+    register_cell_magic(form_sweep)
+    register_cell_magic(form_export)
 
 
 def _register_colab():
@@ -41,27 +86,201 @@ def _register_colab():
     def form_config(line):  # pragma: no cover
         ...
 
+    @register_line_magic
+    def form_gc(line):  # pragma: no cover
+        ...
+
+    @register_cell_magic
+    def form_sweep(args_str, cell):  # pragma: no cover
+        ...
+
+    @register_cell_magic
+    def form_export(args_str, cell):  # pragma: no cover
+        ...
+
 
 @magic_arguments()
 @argument("--col", type=int, default=None, help="Number of columns")
+@argument("--backend", choices=BACKENDS, default=None, help="Widget backend")
+@argument("--output", choices=OUTPUT_MODES, default=None, help="Output mode")
+@argument("--max-lines", type=int, default=None, help="Lines kept in bounded output modes")
+@argument("--rerun", choices=RERUN_POLICIES, default=None, help="When the cell is rerun")
+@argument("--idle-delay", type=float, default=None, help="Seconds without change, for on-idle")
+@argument("--isolate", action="store_true", help="Run the cell in a worker subprocess")
+@argument("--timeout", type=float, default=None, help="Timeout of each isolated run, in seconds")
+@argument("--memory-limit", type=int, default=None, help="Memory of isolated runs, in MB")
+@argument("--profile", action="store_true", help="Show the time of each line of the cell")
 @needs_local_scope
 def form(args_str, cell, local_ns):
     args = parse_argstring(form, args_str)
-    form_data = parser.parse(cell)
-    for err in form_data.errors:
-        logger.warning(f"Error at line {err.lineno}. {err.error}")
+    form_data = _parse(cell)
     col = args.col or CONFIG.get("col", 1)
+    output = dict(
+        output_mode=args.output or CONFIG["output"],
+        max_output_lines=args.max_lines or CONFIG["max_lines"],
+        rerun=args.rerun or CONFIG["rerun"],
+        idle_delay=args.idle_delay or CONFIG["idle_delay"],
+        isolation=_isolation(args),
+        profile=args.profile,
+    )
+    backend = args.backend or CONFIG["backend"]
+    cell_id, options = _cell_id(), (backend, col, tuple(output.items()))
+    prev_options, ref = _FORMS.pop(cell_id, (None, lambda: None))
+    widget = ref()
+    if isinstance(widget, FormWidget) and widget.comm is not None and prev_options == options:
+        widget.ns = local_ns
+        widget.update(form_data)
+    else:
+        if widget is not None:
+            widget.close()
+        widget = _new_form(form_data, local_ns, backend, col, **output)
+    if cell_id is not None:
+        _FORMS[cell_id] = (options, weakref.ref(widget))
+    return widget
+
+
+def _new_form(form_data: Form, ns: dict, backend: str, col: int, **output) -> BaseFormWidget:
+    if backend == "anywidget":
+        from ipyform.anywidget_form import AnyFormWidget
+
+        return AnyFormWidget(form_data, ns=ns, col=col, **output)
     layout = dict(display="grid", grid_template_columns="auto " * col)
-    return FormWidget(form_data, layout=layout, ns=local_ns)
+    return FormWidget(form_data, layout=layout, ns=ns, **output)
+
+
+def _isolation(args) -> Optional[isolate.Isolation]:
+    if not (args.isolate or args.timeout or args.memory_limit):
+        return None
+    return isolate.Isolation(isolate.shared_pool(), args.timeout, args.memory_limit)
+
+
+def _cell_id() -> Optional[str]:
+    """Id of the running cell, sent by JupyterLab and VSCode in the request metadata."""
+    header = getattr(get_ipython(), "parent_header", None) or {}
+    return header.get("metadata", {}).get("cellId")
 
 
 @magic_arguments()
 @argument("--auto-detect", type=bool, default=False, help="Auto detect form")
 @argument("-c", "--col", type=int, default=1, help="Number of columns")
+@argument("--backend", choices=BACKENDS, default="ipywidgets", help="Widget backend")
+@argument("--output", choices=OUTPUT_MODES, default="full", help="Output mode")
+@argument("--max-lines", type=int, default=200, help="Lines kept in bounded output modes")
+@argument("--max-concurrency", type=int, default=1, help="Reruns of all forms running at once")
+@argument("--rerun", choices=RERUN_POLICIES, default="on-change", help="When the cell is rerun")
+@argument("--idle-delay", type=float, default=1.0, help="Seconds without change, for on-idle")
+@argument("--include", default=None, help="Auto detect only the cells matching this regex")
+@argument("--exclude", default=None, help="Never auto detect the cells matching this regex")
 def form_config(line):
     args = parse_argstring(form_config, line)
     CONFIG["auto_detect"] = args.auto_detect
     CONFIG["col"] = args.col
+    CONFIG["backend"] = args.backend
+    CONFIG["output"] = args.output
+    CONFIG["max_lines"] = args.max_lines
+    CONFIG["rerun"] = args.rerun
+    CONFIG["idle_delay"] = args.idle_delay
+    CONFIG["include"] = args.include and re.compile(args.include, re.MULTILINE)
+    CONFIG["exclude"] = args.exclude and re.compile(args.exclude, re.MULTILINE)
+    SCHEDULER.max_concurrency = args.max_concurrency
+
+
+@magic_arguments()
+@argument("--close-all", action="store_true", help="Close all the forms")
+def form_gc(line):
+    """Reports the forms alive in the kernel and the approximate size of their widgets."""
+    args = parse_argstring(form_gc, line)
+    gc.collect()
+    forms = live_forms()
+    if args.close_all:
+        for f in forms:
+            f.close()
+        print(f"Closed {len(forms)} forms")
+        return
+    sizes = [(f, len(descendants(f)), state_size(f)) for f in forms]
+    n_widgets, total = sum(s[1] for s in sizes), sum(s[2] for s in sizes)
+    print(f"{len(forms)} live forms, {n_widgets} widgets, {total / 1024:.1f} KiB")
+    for f, n, size in sizes:
+        label = f.data.title or ", ".join(p.variable for p in f.data.params[:5])
+        print(f"  {type(f).__name__} {label!r}: {n} widgets, {size / 1024:.1f} KiB")
+
+
+@magic_arguments()
+@argument("--mode", choices=("grid", "random"), default="grid", help="Sampling of the params")
+@argument("-n", "--samples", type=int, default=10, help="Number of runs in random mode")
+@argument("--seed", type=int, default=None, help="Seed of the random mode")
+@argument("--max-runs", type=int, default=None, help="Maximum number of runs")
+@argument("--executor", choices=("thread", "process"), default="thread", help="Worker pool")
+@argument("--workers", type=int, default=4, help="Number of concurrent runs")
+@argument(
+    "--timeout", type=float, default=None, help="Timeout of each run in a process, in seconds"
+)
+@argument("--stop-on-error", action="store_true", help="Stop at the first failed run")
+@needs_local_scope
+def form_sweep(args_str, cell, local_ns):
+    """Runs the cell for each combination of param values and streams results into a table."""
+    args = parse_argstring(form_sweep, args_str)
+    form_data = _parse(cell)
+    if args.mode == "grid":
+        combinations = sweep.grid(form_data)
+    else:
+        combinations = sweep.random_samples(form_data, args.samples, seed=args.seed)
+    if args.max_runs is not None:
+        combinations = itertools.islice(combinations, args.max_runs)
+
+    table = w.HTML(sweep.results_table(form_data, []))
+    display(table)
+    results = []
+    for r in sweep.run_sweep(
+        form_data,
+        combinations,
+        ns=local_ns,
+        executor=args.executor,
+        workers=args.workers,
+        timeout=args.timeout,
+        stop=(lambda r: r.error is not None) if args.stop_on_error else None,
+    ):
+        results.append(r)
+        table.value = sweep.results_table(form_data, results)
+
+
+@magic_arguments()
+@argument("-o", "--out", default=None, help="Also write the html to this file")
+@argument("--col", type=int, default=None, help="Number of columns")
+@argument("--max-runs", type=int, default=export.MAX_RUNS, help="Maximum number of runs")
+@argument("--no-outputs", action="store_true", help="Only export the form, without running it")
+@argument("--executor", choices=("thread", "process"), default="thread", help="Worker pool")
+@argument("--workers", type=int, default=4, help="Number of concurrent runs")
+@argument(
+    "--timeout", type=float, default=None, help="Timeout of each run in a process, in seconds"
+)
+@needs_local_scope
+def form_export(args_str, cell, local_ns):
+    """Displays the form as static html, with precomputed outputs, for kernel-less viewers."""
+    args = parse_argstring(form_export, args_str)
+    form_data = _parse(cell)
+    results = []
+    if not args.no_outputs:
+        results = export.precompute(
+            form_data,
+            ns=local_ns,
+            max_runs=args.max_runs,
+            executor=args.executor,
+            workers=args.workers,
+            timeout=args.timeout,
+        )
+    out = export.export_html(form_data, results, col=args.col or CONFIG.get("col", 1))
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out)
+    display(HTML(out))
+
+
+def _parse(cell: str) -> Form:
+    form_data = parser.parse(cell)
+    for err in form_data.errors:
+        logger.warning(f"Error at line {err.lineno}. {err.error}")
+    return form_data
 
 
 def comment_magic_transformer(lines: list[str]):
@@ -74,25 +293,50 @@ def comment_magic_transformer(lines: list[str]):
      - Transform `#! %%form` to `%%form`
 
     In auto_detection mode:
-     - Auto add `%%form` to the first line if `# @param` is found.
+     - Auto add `%%form` to the first line if `# @param` is found, unless the cell doesn't
+       match the `include` regex or matches the `exclude` regex.
 
     The use of `#! %%form` allows Pylance to only see python code and not the magic, which would otherwise confuse it, and cause it to be disabled.
+
+    Decisions are cached by cell content, so cells run again are not scanned again.
     """
     if env.IN_COLAB:
         return [line for line in lines if not line.startswith(("%%form", "%%form_config"))]
 
-    out = list(lines)
-    for i, line in enumerate(lines):
-        if re.match(r"^#!\s*%%form", line):
-            out = list(lines)
-            out[i] = re.sub(r"^#!\s*", "", line)
-            return out
+    code = "".join(lines)
+    if "%%form" not in code and "# @param" not in code:
+        return lines
+    digest = hashlib.blake2b(code.encode(), digest_size=16).digest()
+    key = (digest, CONFIG["auto_detect"], CONFIG["include"], CONFIG["exclude"])
+    if key in _DECISIONS:
+        _DECISIONS.move_to_end(key)
+        i = _DECISIONS[key]
+    else:
+        i = _DECISIONS[key] = _decide(lines, code)
+        if len(_DECISIONS) > DECISION_CACHE_SIZE:
+            _DECISIONS.popitem(last=False)
 
-    if CONFIG["auto_detect"] and any("# @param" in line for line in lines):
+    if i == _ADD_MAGIC:
         return ["%%form"] + lines
+    if i is not None:
+        out = list(lines)
+        out[i] = re.sub(r"^#!\s*", "", lines[i])
+        return out
     return lines
 
 
+def _decide(lines: list[str], code: str) -> Optional[int]:
+    for i, line in enumerate(lines):
+        if re.match(r"^#!\s*%%form", line):
+            return i
+    if not CONFIG["auto_detect"] or "# @param" not in code:
+        return None
+    include, exclude = CONFIG["include"], CONFIG["exclude"]
+    if (include and not include.search(code)) or (exclude and exclude.search(code)):
+        return None
+    return _ADD_MAGIC
+
+
 COLLAPSE_CODE_SCRIPT = """
 <script>
 function code_toggle(id) {
@@ -0,0 +1,244 @@
+"""Runs form cells in worker subprocesses, so a runaway cell can't take the kernel down.
+
+Workers are started ahead of time and reused across reruns. Each rerun sends the code to an
+idle worker, with the picklable entries of the form namespace that the cell refers to. The
+worker sends back its stdout and the variables the cell assigned.
+
+- A rerun exceeding its timeout kills the worker, which is replaced by a new one.
+- The memory limit caps the address space of the worker during the rerun (`RLIMIT_AS`, not
+  available on Windows). Exceeding it raises a `MemoryError` in the cell.
+- A worker that dies (e.g. a segfault in a C extension) is replaced by a new one.
+
+`display()` has no frontend in the worker: displayed objects are printed as text.
+"""
+
+import ast
+import atexit
+import importlib
+import io
+import multiprocessing
+import pickle
+import queue
+import sys
+import threading
+import types
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+POOL_SIZE = 2
+# Entries IPython adds to the notebook namespace, never sent to the workers
+IPYTHON_NAMES = {"In", "Out", "get_ipython", "exit", "quit"}
+
+_POOL: Optional["WorkerPool"] = None
+_POOL_LOCK = threading.Lock()
+
+
+class WorkerError(RuntimeError):
+    """The cell failed in the worker. The message is the error of the cell."""
+
+
+@dataclass
+class RunResult:
+    output: str = ""
+    error: Optional[str] = None
+    duration: float = 0.0
+    ns: dict[str, bytes] = field(default_factory=dict)  # assigned variables, pickled
+    result: Optional[str] = None  # repr of the last expression, if any
+
+
+@dataclass
+class _Worker:
+    process: BaseProcess
+    conn: Connection
+    ready: bool = False  # started, so that its startup doesn't count in the timeout
+
+
+class WorkerPool:
+    """Worker subprocesses started ahead of time. Each runs one cell at a time."""
+
+    def __init__(self, size: int = POOL_SIZE):
+        self._ctx = multiprocessing.get_context("spawn")  # forking a kernel with threads is unsafe
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: list[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def run(
+        self,
+        code: str,
+        ns: dict,
+        timeout: Optional[float] = None,
+        memory_limit: Optional[int] = None,
+    ) -> RunResult:
+        """Runs the code in an idle worker, waiting for one if all are busy.
+
+        `memory_limit` is in MB. Errors of the cell, timeouts and dead workers are reported in
+        `RunResult.error`.
+        """
+        worker = self._idle.get()
+        try:
+            try:
+                if not worker.ready:
+                    worker.conn.recv()
+                    worker.ready = True
+                worker.conn.send((code, dumps(cell_namespace(code, ns)), memory_limit))
+                if not worker.conn.poll(timeout):
+                    worker = self._replace(worker)
+                    return RunResult(error=f"TimeoutError: exceeded {timeout}s", duration=timeout)
+                return worker.conn.recv()
+            except (EOFError, OSError):
+                worker.process.join(1)
+                exitcode = worker.process.exitcode
+                worker = self._replace(worker)
+                return RunResult(error=f"WorkerError: worker died with exit code {exitcode}")
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """Kills the workers. Runs in progress fail, and no new worker is started."""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.conn.close()
+            worker.process.kill()
+            worker.process.join()
+
+    @property
+    def pids(self) -> list[int]:
+        with self._lock:
+            return [worker.process.pid for worker in self._workers]
+
+    def _spawn(self) -> _Worker:
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_serve, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, conn)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.conn.close()
+        worker.process.kill()
+        worker.process.join()
+        return worker if self._closed else self._spawn()
+
+
+@dataclass(frozen=True)
+class Isolation:
+    """Runs the reruns of a form in a worker pool, with limits per rerun."""
+
+    pool: WorkerPool
+    timeout: Optional[float] = None  # seconds
+    memory_limit: Optional[int] = None  # MB
+
+    def exec(self, code: str, ns: dict):
+        """Like `exec(code, ns)`: prints the output, updates `ns` and raises on error."""
+        r = self.pool.run(code, ns, timeout=self.timeout, memory_limit=self.memory_limit)
+        sys.stdout.write(r.output)
+        ns.update(loads(r.ns))
+        if r.error is not None:
+            raise WorkerError(r.error)
+
+
+def shared_pool() -> WorkerPool:
+    """The pool used by `%%form --isolate`, started on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = WorkerPool()
+            atexit.register(_POOL.close)
+        return _POOL
+
+
+def cell_namespace(code: str, ns: dict) -> dict:
+    """The entries of `ns` the code refers to, so that each rerun only pickles what it uses."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return {}  # reported by the worker
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    return {k: ns[k] for k in names - IPYTHON_NAMES if k in ns}
+
+
+def dumps(ns: dict) -> dict[str, bytes]:
+    """Pickles each entry of the namespace. Private names and unpicklable values are skipped.
+
+    Modules are pickled by name, and imported again when unpickled.
+    """
+    out = {}
+    for k, v in ns.items():
+        if k.startswith("_"):
+            continue
+        buffer = io.BytesIO()
+        try:
+            _Pickler(buffer).dump(v)
+        except Exception:
+            continue
+        out[k] = buffer.getvalue()
+    return out
+
+
+def loads(data: dict[str, bytes]) -> dict:
+    """Unpickles each entry. Values that can't be unpickled here are skipped."""
+    out = {}
+    for k, v in data.items():
+        try:
+            out[k] = pickle.loads(v)
+        except Exception:
+            pass
+    return out
+
+
+class _Pickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if isinstance(obj, types.ModuleType):
+            return importlib.import_module, (obj.__name__,)
+        return NotImplemented
+
+
+def _serve(conn):
+    """Main loop of a worker."""
+    from ipyform.sweep import _execute
+
+    conn.send(None)  # ready
+    while True:
+        try:
+            code, data, memory_limit = conn.recv()
+        except EOFError:
+            return
+        ns = loads(data)
+        inputs = dict(ns)
+        _set_memory_limit(memory_limit)
+        try:
+            with redirect_stdout(io.StringIO()):
+                output, result, error, duration = _execute(code, ns)
+        finally:
+            _set_memory_limit(None)
+        assigned = {k: v for k, v in ns.items() if k not in inputs or v is not inputs[k]}
+        conn.send(RunResult(output, error, duration, dumps(assigned), result))
+
+
+def _set_memory_limit(mb: Optional[int]):
+    if resource is None:  # pragma: no cover
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = hard if mb is None else mb * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
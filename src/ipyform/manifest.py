@@ -0,0 +1,168 @@
+"""Manifest of the forms found in the `.py` files of a repository.
+
+    ipyform-manifest path/to/repo -o forms.json --check
+
+Files are split into cells on `# %%` lines. Cells with a `#! %%form` header are parsed as
+forms. Results are kept in an index next to the scanned files: a file is only parsed again
+when its size or mtime changed, and its content hash too.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from ipyform import parser
+
+INDEX_NAME = ".ipyform-index.json"
+INDEX_VERSION = 1
+SKIP_DIRS = {".git", ".hg", ".venv", "venv", "node_modules", "__pycache__", "build", "dist"}
+# Below this number of changed files, parsing in the main process is faster than starting workers
+MIN_PARALLEL = 16
+
+CELL_RE = re.compile(r"^# %%", re.MULTILINE)
+FORM_RE = re.compile(r"^#!\s*%%form", re.MULTILINE)
+
+
+@dataclass
+class Scan:
+    forms: list[dict]
+    files: int  # python files found
+    parsed: int  # files parsed again, because they changed
+
+
+def scan(root: str, index_path: Optional[str] = None, workers: Optional[int] = None) -> Scan:
+    """Returns the forms of all the python files under `root`, and updates the index."""
+    root_path = Path(root)
+    index_path = Path(index_path) if index_path else root_path / INDEX_NAME
+    index = _load_index(index_path)
+    files, changed = {}, []
+    for rel, st in _python_files(root):
+        entry = index.get(rel)
+        if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            changed.append(rel)
+            entry = dict(mtime_ns=st.st_mtime_ns, size=st.st_size, hash=entry and entry["hash"])
+        files[rel] = entry
+
+    args = ([root_path] * len(changed), changed, [files[rel]["hash"] for rel in changed])
+    pool = ProcessPoolExecutor(workers) if len(changed) >= MIN_PARALLEL else None
+    parsed = 0
+    try:
+        results = pool.map(_scan_file, *args, chunksize=32) if pool else map(_scan_file, *args)
+        for rel, (digest, forms) in zip(changed, results):
+            if forms is None:  # same content, only touched
+                forms = index[rel]["forms"]
+            else:
+                parsed += 1
+            files[rel].update(hash=digest, forms=forms)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if changed or files.keys() != index.keys():
+        _save_index(index_path, files)
+    forms = [f for rel in sorted(files) for f in files[rel]["forms"]]
+    return Scan(forms=forms, files=len(files), parsed=parsed)
+
+
+def file_forms(path: str, code: str) -> list[dict]:
+    """Parses the form cells of a file."""
+    out = []
+    starts = [0] + [m.start() for m in CELL_RE.finditer(code) if m.start() > 0]
+    for start, end in zip(starts, starts[1:] + [len(code)]):
+        cell = code[start:end]
+        if not FORM_RE.search(cell):
+            continue
+        lineno = code.count("\n", 0, start) + 1
+        form = dict(path=path, lineno=lineno, title=None, params=[], errors=[])
+        try:
+            data = parser.parse(cell)
+        except SyntaxError as e:
+            form["errors"].append(dict(lineno=lineno + (e.lineno or 1) - 1, error=str(e)))
+            out.append(form)
+            continue
+        form["title"] = data.title
+        for p in data.params:
+            param = asdict(p)
+            param.update(lineno=lineno + p.lineno - 1)
+            form["params"].append(param)
+        for err in data.errors:
+            form["errors"].append(dict(lineno=lineno + err.lineno - 1, error=err.error))
+        out.append(form)
+    return out
+
+
+def _scan_file(root: Path, rel: str, known_hash: Optional[str]) -> tuple[str, Optional[list]]:
+    """Returns the hash of the file, and its forms or None when the hash is `known_hash`."""
+    content = (root / rel).read_bytes()
+    digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    if digest == known_hash:
+        return digest, None
+    code = content.decode("utf-8", errors="replace")
+    if not FORM_RE.search(code):
+        return digest, []
+    return digest, file_forms(rel, code)
+
+
+def _python_files(root: str, prefix: str = ""):
+    """Yields the relative path and the stat of each python file."""
+    dirs = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS and not entry.name.startswith("."):
+                    dirs.append(entry)
+            elif entry.name.endswith(".py") and entry.is_file():
+                yield prefix + entry.name, entry.stat()
+    for entry in sorted(dirs, key=lambda e: e.name):
+        yield from _python_files(entry.path, prefix + entry.name + "/")
+
+
+def _load_index(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return data["files"] if data.get("version") == INDEX_VERSION else {}
+
+
+def _save_index(path: Path, files: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": INDEX_VERSION, "files": files}, default=str))
+    os.replace(tmp, path)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="ipyform-manifest", description=__doc__.splitlines()[0])
+    ap.add_argument("root", nargs="?", default=".", help="Directory to scan")
+    ap.add_argument("-o", "--output", default=None, help="Manifest file. Default: stdout")
+    ap.add_argument("--index", default=None, help=f"Index file. Default: <root>/{INDEX_NAME}")
+    ap.add_argument("--workers", type=int, default=None, help="Number of parsing processes")
+    ap.add_argument("--check", action="store_true", help="Exit with 1 if any form has errors")
+    args = ap.parse_args(argv)
+
+    result = scan(args.root, index_path=args.index, workers=args.workers)
+    manifest = json.dumps({"forms": result.forms}, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(manifest)
+    else:
+        print(manifest)
+    print(
+        f"{len(result.forms)} forms in {result.files} files ({result.parsed} parsed)",
+        file=sys.stderr,
+    )
+
+    errors = [(f["path"], e) for f in result.forms for e in f["errors"]]
+    for path, e in errors:
+        print(f"{path}:{e['lineno']}: {e['error']}", file=sys.stderr)
+    return 1 if args.check and errors else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
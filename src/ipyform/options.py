@@ -0,0 +1,33 @@
+"""Session-wide interning of dropdown options.
+
+Templated notebooks repeat the same option lists in many forms. Equal lists parsed anywhere
+in the session share one tuple, which is passed as is to the widgets, and one frozenset for
+lookups. The `CACHE_SIZE` most recently used lists are kept.
+"""
+
+from collections import OrderedDict
+from typing import Iterable
+
+Options = tuple[str, ...]
+
+CACHE_SIZE = 1024
+
+_CACHE: "OrderedDict[Options, tuple[Options, frozenset[str]]]" = OrderedDict()
+
+
+def intern_options(options: Iterable) -> Options:
+    """Returns the shared tuple equal to the options, converted to strings."""
+    key = tuple(str(o) for o in options)
+    if key in _CACHE:
+        _CACHE.move_to_end(key)
+        return _CACHE[key][0]
+    _CACHE[key] = (key, frozenset(key))
+    if len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return key
+
+
+def option_set(options: Options) -> frozenset[str]:
+    """Returns the set of the options, shared when they are interned."""
+    entry = _CACHE.get(options)
+    return entry[1] if entry is not None and entry[0] is options else frozenset(options)
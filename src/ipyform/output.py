@@ -0,0 +1,142 @@
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import Literal, Optional
+
+import ipywidgets as w
+from IPython import get_ipython
+from IPython.utils.capture import CapturedIO, capture_output
+
+OutputMode = Literal["full", "bounded", "last"]
+
+TRUNCATED = "... {} lines truncated ...\n"
+MAX_LINE_LENGTH = 10_000
+
+
+class BoundedOutput:
+    """Captures the output of a rerun and forwards it to an `Output` widget, with bounded size.
+
+    - Only the last `max_lines` lines of stdout/stderr are kept. Older lines are dropped and
+      replaced by a truncation indicator.
+    - The widget is updated at most once every `flush_interval` seconds while the code runs,
+      and once at the end. Throttled writes are flushed by a timer, so that the output of a
+      cell that prints and then blocks still shows up.
+    - With `last_display_only`, only the final `display()` call of the rerun is kept.
+    """
+
+    def __init__(
+        self,
+        widget: w.Output,
+        max_lines: int = 200,
+        flush_interval: float = 0.25,
+        last_display_only: bool = False,
+    ):
+        self.widget = widget
+        self.flush_interval = flush_interval
+        self.last_display_only = last_display_only
+        self.lines: deque[tuple[str, str]] = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.captured: Optional[CapturedIO] = None
+        self._last_flush = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()  # the timer flushes from another thread
+
+    @contextmanager
+    def capture(self):
+        self.lines.clear()
+        self.dropped = 0
+        self.captured = None
+        self.flush(force=True)
+        stdout, stderr = _Stream(self, "stdout"), _Stream(self, "stderr")
+        with capture_output(stdout=False, stderr=False) as self.captured:
+            try:
+                with redirect_stdout(stdout), redirect_stderr(stderr):
+                    yield
+            except Exception:
+                self.write("stderr", traceback.format_exc())
+                # Same as `Output`: only swallow the exception when it can be shown to the user
+                if get_ipython() is None:
+                    raise
+            finally:
+                self._cancel_timer()
+                self.flush(force=True)
+
+    def write(self, name: str, s: str):
+        with self._lock:
+            self._append(name, s)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._trailing_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _append(self, name: str, s: str):
+        for line in s.splitlines(keepends=True):
+            if self.lines and self.lines[-1][0] == name and not self.lines[-1][1].endswith("\n"):
+                line = self.lines.pop()[1] + line
+            elif len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            if len(line) > MAX_LINE_LENGTH:
+                end = "\n" if line.endswith("\n") else ""
+                line = line[:MAX_LINE_LENGTH] + "... (line truncated)" + end
+            self.lines.append((name, line))
+
+    def flush(self, force: bool = False):
+        with self._lock:
+            if not force and time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = time.monotonic()
+            self.widget.outputs = tuple(self.outputs())
+
+    def _trailing_flush(self):
+        self._timer = None
+        self.flush(force=True)
+
+    def _cancel_timer(self):
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def outputs(self) -> list[dict]:
+        """Returns the captured output, in the format of the `Output.outputs` trait."""
+        out = []
+        if self.dropped:
+            out.append(_stream("stdout", TRUNCATED.format(self.dropped)))
+        for name, line in self.lines:
+            if out and out[-1]["name"] == name:
+                out[-1]["text"] += line
+            else:
+                out.append(_stream(name, line))
+        displays = self.captured.outputs if self.captured is not None else []
+        for d in displays[-1:] if self.last_display_only else displays:
+            out.append({"output_type": "display_data", "data": d.data, "metadata": d.metadata})
+        return out
+
+
+def bounded_output(widget: w.Output, mode: OutputMode, max_lines: int) -> Optional[BoundedOutput]:
+    """Returns the output capture of the mode. `full` forwards everything to the widget as is."""
+    if mode == "full":
+        return None
+    return BoundedOutput(widget, max_lines=max_lines, last_display_only=mode == "last")
+
+
+def _stream(name: str, text: str) -> dict:
+    return {"output_type": "stream", "name": name, "text": text}
+
+
+class _Stream:
+    encoding = "utf-8"
+
+    def __init__(self, output: BoundedOutput, name: str):
+        self.output = output
+        self.name = name
+
+    def write(self, s: str) -> int:
+        self.output.write(self.name, s)
+        return len(s)
+
+    def flush(self):
+        pass
@@ -1,13 +1,69 @@
 import ast
-from typing import Any, Optional
+import re
+from typing import Any, Iterable, Iterator, Optional, Union
 
 import chompjs
 
 from ipyform.entities import Form, Markdown, Param, ParamError
+from ipyform.options import intern_options, option_set
+
+# Limits on user-written comments, so that a pathological one can't hang the kernel
+MAX_JSON_LENGTH = 128 * 1024  # fits option lists of a few thousand entries
+MAX_PARSE_ATTEMPTS = 32
+MAX_QUOTED_LENGTH = 100  # of a comment quoted in an error message
+
+# Cells without a match have no form, and are not parsed
+_ANNOTATION_RE = re.compile(r"#\s*@param|^# @(title|markdown)", re.MULTILINE)
+
+
+class _ParseState:
+    """Parse results shared by the cells of a `parse_many` call."""
+
+    def __init__(self):
+        # comment -> (options, config), or the error message
+        self.comments: dict[str, Union[tuple[Optional[list], dict], str]] = {}
+
+    def parse_comment(self, comment: str) -> tuple[Optional[list], dict]:
+        if comment not in self.comments:
+            try:
+                self.comments[comment] = _parse_comment(comment)
+            except ValueError as e:
+                self.comments[comment] = str(e)
+        result = self.comments[comment]
+        if isinstance(result, str):
+            raise ValueError(result)
+        options, config = result
+        return options, dict(config)  # config is completed with defaults by _create_param
 
 
 def parse(code: str) -> Form:
     """Parses Python code to extract variables assigned with @param annotations."""
+    return _parse(code, _ParseState())
+
+
+def parse_many(cells: Iterable[str]) -> Iterator[Form]:
+    """Parses many cells, e.g. all the cells of a notebook, and yields their forms in order.
+
+    Cells without annotations are not parsed, and yield an empty form. Annotated cells that
+    aren't valid python (e.g. with IPython magics) yield a form with the syntax error. Comments
+    repeated across cells are parsed once.
+    """
+    state = _ParseState()
+    for code in cells:
+        lines = code.splitlines()
+        if not _ANNOTATION_RE.search(code):
+            yield Form(code=lines, title=None, params=[], markdowns=[], errors=[])
+            continue
+        try:
+            yield _parse(code, state)
+        except SyntaxError as e:
+            lineno = e.lineno or 1
+            line = lines[lineno - 1] if lineno <= len(lines) else ""
+            error = ParamError(code=line, lineno=lineno, error=str(e))
+            yield Form(code=lines, title=None, params=[], markdowns=[], errors=[error])
+
+
+def _parse(code: str, state: _ParseState) -> Form:
     lines = code.splitlines()
     tree = ast.parse(code)
     params, failures = [], []
@@ -30,7 +86,7 @@ def parse(code: str) -> Form:
 
         # Process the comment for options and config
         try:
-            options, config = _parse_comment(comment)
+            options, config = state.parse_comment(comment)
         except ValueError as e:
             failures.append(ParamError(error=str(e), code=line, lineno=node.lineno))
             continue
@@ -106,23 +162,33 @@ def _parse_comment(comment: str) -> tuple[Optional[list[str]], dict[str, Any]]:
         else:
             return options, {}
 
-    raise ValueError(f"Unable to parse @param comment: `{comment}`")
+    raise ValueError(f"Unable to parse @param comment: `{_excerpt(comment)}`")
 
 
 def _try_consume_json(s: str, start_idx: int) -> tuple[Any, int]:
-    """Attempts to parse a JSON object or list from a string starting at a specified index."""
+    """Attempts to parse a JSON object or list from a string starting at a specified index.
+
+    Each closing bracket is tried as the end of the object, up to `MAX_PARSE_ATTEMPTS` times.
+    """
+    if len(s) - start_idx > MAX_JSON_LENGTH:
+        raise ValueError(f"Comment too long: {len(s) - start_idx} > {MAX_JSON_LENGTH} characters")
     first_char = s[start_idx]
     end_char = "}" if first_char == "{" else "]"
     i = start_idx + 1
-    while i != -1:
+    for _ in range(MAX_PARSE_ATTEMPTS):
         i = s.find(end_char, i)
-        if i != -1:
-            try:
-                return chompjs.parse_js_object(s[start_idx : i + 1]), i + 1
-                # return json.loads(s[start_idx : i + 1]), i + 1
-            except ValueError:
-                i += 1
-    raise ValueError(f"JSON parsing failed for: `{s[start_idx:]}`")
+        if i == -1:
+            break
+        try:
+            return chompjs.parse_js_object(s[start_idx : i + 1]), i + 1
+            # return json.loads(s[start_idx : i + 1]), i + 1
+        except (ValueError, RecursionError):  # RecursionError: too deeply nested
+            i += 1
+    raise ValueError(f"JSON parsing failed for: `{_excerpt(s[start_idx:])}`")
+
+
+def _excerpt(s: str) -> str:
+    return s if len(s) <= MAX_QUOTED_LENGTH else s[:MAX_QUOTED_LENGTH] + "…"
 
 
 def _extract_title_and_display_mode(lines: list[str]) -> tuple[Optional[str], Optional[str]]:
@@ -167,17 +233,24 @@ def _create_param(variable, value, options, config, code, lineno) -> Param:
     typ_ = config.get("type")
 
     # Dropdown
-    if options is not None:
+    if options is not None or "source" in config:
         field_type = "dropdown"
-        if err := _check_properties(config, "Dropdowns", ["type", "allow-input"]):
+        if err := _check_properties(config, "Dropdowns", ["type", "allow-input", "source"]):
             return _error(err)
         if typ_ is None:
             typ_ = "string"
         if err := _check_type(typ_, "Dropdowns", ["string", "raw"]):
             return _error(err)
-        options = [str(o) for o in options]
-        if not config.get("allow-input") and str(value) not in options:
-            return _error(f"Value {value} not in options: {options}")
+        if "source" in config:
+            # Options are fetched from the provider when the form is rendered
+            if options is not None:
+                return _error("Dropdowns take either an options list or a source, not both")
+            if not isinstance(config["source"], str):
+                return _error(f"source must be a name. Found: {config['source']}")
+        else:
+            options = intern_options(options)
+            if not config.get("allow-input") and str(value) not in option_set(options):
+                return _error(f"Value {value} not in options: {list(options)}")
 
     # Slider
     elif typ_ == "slider":
@@ -190,11 +263,11 @@ def _create_param(variable, value, options, config, code, lineno) -> Param:
             else:
                 try:
                     config[k] = float(config[k])
-                except ValueError:
+                except (TypeError, ValueError):
                     return _error(f"{k} must be a number. Found: {config[k]}")
         try:
             value = float(value)
-        except ValueError:
+        except (TypeError, ValueError):
             return _error(f"value must be a number. Found: {value}")
         if config["min"] > config["max"]:
             return _error("Min must be less than max")
@@ -222,6 +295,7 @@ def _create_param(variable, value, options, config, code, lineno) -> Param:
         var_type=typ_ if typ_ != "slider" else "number",
         options=options,
         allow_input=config.get("allow-input", False),
+        source=config.get("source"),
         min=config.get("min"),
         max=config.get("max"),
         step=config.get("step"),
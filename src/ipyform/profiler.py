@@ -0,0 +1,88 @@
+"""Per-line timing of form reruns, for `%%form --profile`.
+
+The cell is compiled with a pseudo filename, registered in `linecache` so that tracebacks and
+debuggers show its source. A `sys.settrace` tracer follows the frames of that file only: the
+time of a line includes the functions it calls. Only the thread running the cell is traced.
+"""
+
+import html
+import linecache
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import CodeType
+
+TOP_LINES = 10
+
+
+@dataclass
+class LineStats:
+    hits: int = 0
+    time: float = 0.0
+
+
+class LineProfiler:
+    def __init__(self):
+        self.filename = f"<form-{uuid.uuid4().hex[:8]}>"
+        self.lines: list[str] = []
+        self.stats: dict[int, LineStats] = {}  # lineno -> stats
+        self.total = 0.0
+
+    def compile(self, code: str) -> CodeType:
+        """Compiles the code under the pseudo filename of the form."""
+        self.lines = code.splitlines(keepends=True)
+        linecache.cache[self.filename] = (len(code), None, self.lines, self.filename)
+        return compile(code, self.filename, "exec")
+
+    @contextmanager
+    def trace(self):
+        """Collects the time of each line of the code run in the context."""
+        self.stats = {}
+        previous = sys.gettrace()
+        start = time.perf_counter()
+        sys.settrace(self._trace)
+        try:
+            yield
+        finally:
+            sys.settrace(previous)
+            self.total = time.perf_counter() - start
+
+    def table(self, top: int = TOP_LINES) -> str:
+        """Renders the slowest lines of the last run as an html table."""
+        hot = sorted(self.stats.items(), key=lambda x: -x[1].time)[:top]
+        header = "".join(f"<th>{h}</th>" for h in ["line", "hits", "time (ms)", "%", "code"])
+        rows = []
+        for lineno, s in hot:
+            source = self.lines[lineno - 1].strip() if lineno <= len(self.lines) else ""
+            share = 100 * s.time / self.total if self.total else 0
+            cells = [str(lineno), str(s.hits), f"{s.time * 1000:.1f}", f"{share:.0f}", source]
+            rows.append("<tr>" + "".join(f"<td>{html.escape(c)}</td>" for c in cells) + "</tr>")
+        return (
+            f"<table><tr>{header}</tr>{''.join(rows)}</table>"
+            f"<small>Total: {self.total * 1000:.1f} ms</small>"
+        )
+
+    def close(self):
+        linecache.cache.pop(self.filename, None)
+
+    def _trace(self, frame, event, arg):
+        if frame.f_code.co_filename != self.filename:
+            return None
+        current, since = None, time.perf_counter()
+
+        def trace_lines(frame, event, arg):
+            nonlocal current, since
+            now = time.perf_counter()
+            if current is not None:
+                self.stats[current].time += now - since
+            if event == "line":
+                current = frame.f_lineno
+                self.stats.setdefault(current, LineStats()).hits += 1
+            elif event == "return":
+                current = None
+            since = now
+            return trace_lines
+
+        return trace_lines
@@ -0,0 +1,128 @@
+"""Dropdown options fetched lazily from a provider named in the `@param` comment.
+
+    table = "users" # @param {type: "string", source: "list_tables"}
+
+The provider is looked up in the form namespace. It can be a callable returning an iterable,
+or an iterable. Options are consumed one page at a time, so generators are only run as far
+as needed. Providers are cached by name for `TTL` seconds, across reruns of the cell.
+
+A provider that raises is logged, and its dropdown keeps only the options loaded so far.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+PAGE_SIZE = 100
+TTL = 300.0
+MORE = "… more"
+
+logger = logging.getLogger(__package__)
+
+_CACHE: dict[str, "OptionProvider"] = {}
+
+
+class OptionProvider:
+    def __init__(self, source: Any, page_size: Optional[int] = None, name: str = ""):
+        self.source = source
+        self.page_size = page_size or PAGE_SIZE
+        self.name = name
+        self.options: list[str] = []
+        self.exhausted = False
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self._iterator = None
+        self._lock = threading.Lock()
+
+    def fetch_page(self) -> list[str]:
+        """Loads the next page of options. Returns all the options loaded so far."""
+        with self._lock:
+            if self.exhausted:
+                return self.options
+            try:
+                if self._iterator is None:
+                    source = self.source() if callable(self.source) else self.source
+                    self._iterator = iter(source)
+                page = [str(o) for o in itertools.islice(self._iterator, self.page_size)]
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                self.exhausted = True
+                logger.warning(f"Options source `{self.name}` failed. {self.error}")
+                return self.options
+            self.options = self.options + page
+            self.exhausted = len(page) < self.page_size
+            return self.options
+
+    def expired(self, ttl: float) -> bool:
+        # Iterators can't be restarted, so their options are kept. Failed calls are retried.
+        if not callable(self.source):
+            return False
+        return self.error is not None or time.monotonic() - self.created > ttl
+
+
+def get_provider(name: str, ns: dict, ttl: Optional[float] = None) -> Optional[OptionProvider]:
+    """Returns the cached provider of `name`, or a new one if it expired or was redefined."""
+    ttl = TTL if ttl is None else ttl
+    source = ns.get(name)
+    if source is None:
+        logger.warning(f"Options source `{name}` not found")
+        return None
+    provider = _CACHE.get(name)
+    if provider is None or provider.source is not source or provider.expired(ttl):
+        provider = _CACHE[name] = OptionProvider(source, name=name)
+    return provider
+
+
+class LazyOptions:
+    """Keeps the options of a dropdown widget in sync with its provider.
+
+    The first page is loaded in a background thread, so rendering the form doesn't wait for
+    the provider. Selecting the `MORE` entry loads the next page.
+    """
+
+    def __init__(self, widget, provider: OptionProvider, background: bool = True):
+        self.widget = widget
+        self.provider = provider
+        self._updating = False
+        self.thread = None
+        if provider.options:
+            self._refresh()
+        if not provider.exhausted and not provider.options:
+            self.load_more(background)
+
+    def load_more(self, background: bool = False):
+        if background:
+            self.thread = threading.Thread(target=self.load_more, daemon=True)
+            self.thread.start()
+            return
+        self.provider.fetch_page()
+        self._refresh()
+
+    def intercept(self, evt) -> bool:
+        """Handles the value changes made by this class. Returns True if `evt` is one."""
+        if self._updating:
+            return True
+        if evt["new"] != MORE:
+            return False
+        self._set(self.widget.options, evt["old"])
+        self.load_more()
+        return True
+
+    def _refresh(self):
+        value = self.widget.value
+        options = list(self.provider.options)
+        if value not in options:
+            options.insert(0, value)
+        if not self.provider.exhausted:
+            options.append(MORE)
+        self._set(options, value)
+
+    def _set(self, options, value):
+        self._updating = True
+        try:
+            self.widget.options = options
+            self.widget.value = value
+        finally:
+            self._updating = False
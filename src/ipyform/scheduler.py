@@ -0,0 +1,125 @@
+"""Kernel-wide scheduling of form reruns.
+
+All forms exec into shared namespaces. Reruns are queued per form and run by whichever thread
+submits them, at most `max_concurrency` at a time (1 by default, i.e. serialized). A rerun
+submitted while the limit is reached runs as soon as a slot frees up, in the thread that
+frees it.
+
+- Each rerun reads the current values of its form, so a form has at most one pending rerun:
+  new submissions replace the pending one.
+- The focused form (the last one the user interacted with) goes first, then higher
+  priorities, then the form that waited the longest since it was last served.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+logger = logging.getLogger(__package__)
+
+
+@dataclass
+class _Job:
+    form: object
+    fn: Callable[[], None]
+    priority: int
+    thread: int
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class RerunScheduler:
+    def __init__(self, max_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self._focused: Optional[weakref.ref] = None
+        self._lock = threading.Lock()
+        self._pending: dict[object, _Job] = {}  # form -> job
+        self._last_served: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._running = 0
+        self._completed = 0
+        self._coalesced = 0
+        self._waits: deque[float] = deque(maxlen=1000)
+
+    def submit(self, form, fn: Callable[[], None], priority: int = 0):
+        """Queues `fn` as the next rerun of `form`, then runs queued reruns if a slot is free.
+
+        Exceptions of reruns submitted by the calling thread are re-raised.
+        """
+        with self._lock:
+            if form in self._pending:
+                self._coalesced += 1
+                enqueued = self._pending[form].enqueued
+                self._pending[form] = _Job(form, fn, priority, threading.get_ident(), enqueued)
+            else:
+                self._pending[form] = _Job(form, fn, priority, threading.get_ident())
+        self._drain()
+
+    @property
+    def focused(self):
+        return self._focused() if self._focused is not None else None
+
+    def focus(self, form):
+        self._focused = weakref.ref(form)
+
+    def forget(self, form):
+        """Drops the pending rerun and the state of a form that is closed."""
+        with self._lock:
+            self._pending.pop(form, None)
+            self._last_served.pop(form, None)
+            if self.focused is form:
+                self._focused = None
+
+    def stats(self) -> dict:
+        """Returns the queue depth and the wait times (in seconds) of the last reruns."""
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                "queue_depth": len(self._pending),
+                "running": self._running,
+                "completed": self._completed,
+                "coalesced": self._coalesced,
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_max": max(waits, default=0.0),
+            }
+
+    def _next(self) -> _Job:
+        focused = self.focused
+
+        def rank(job: _Job):
+            return (job.form is not focused, -job.priority, self._last_served.get(job.form, 0.0))
+
+        job = min(self._pending.values(), key=rank)
+        del self._pending[job.form]
+        return job
+
+    def _drain(self):
+        me = threading.get_ident()
+        error = None
+        while True:
+            with self._lock:
+                if self._running >= self.max_concurrency or not self._pending:
+                    break
+                job = self._next()
+                self._running += 1
+                now = time.monotonic()
+                self._waits.append(now - job.enqueued)
+                self._last_served[job.form] = now
+            try:
+                job.fn()
+            except Exception as e:
+                if job.thread == me and error is None:
+                    error = e
+                else:
+                    logger.exception("Rerun failed")
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+        if error is not None:
+            raise error
+
+
+SCHEDULER = RerunScheduler()
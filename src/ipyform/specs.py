@@ -0,0 +1,121 @@
+"""Widget specs: which widget renders each param, and with which arguments.
+
+Specs are plain, JSON-serializable data computed without importing ipywidgets. They are
+cached per cell code, so rendering a form that was already seen skips the planning step.
+"""
+
+import math
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from ipyform.entities import Form, Param
+from ipyform.options import intern_options
+
+DESCRIPTION_STYLE = {"description_width": "150px"}
+FIELD_LAYOUT = {"width": "400px"}
+
+_CACHE: "OrderedDict[str, list[FieldSpec]]" = OrderedDict()
+CACHE_SIZE = 256
+
+# Widgets whose value is passed to the cell as a python number, instead of as code
+NATIVE_TYPES = {"IntText": int, "IntSlider": int, "FloatText": float, "FloatSlider": float}
+# Larger integers lose precision in the browser. They are edited as text.
+MAX_SAFE_INTEGER = 2**53 - 1
+
+
+@dataclass
+class FieldSpec:
+    variable: str
+    lineno: int
+    widget: str  # ipywidgets class name
+    kwargs: dict[str, Any]  # widget arguments, without layout and style
+    source: Optional[str] = None  # options provider, resolved when the widget is created
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FieldSpec":
+        d = dict(d)
+        if "options" in d["kwargs"]:
+            d["kwargs"] = dict(d["kwargs"], options=intern_options(d["kwargs"]["options"]))
+        return cls(**d)
+
+
+def param_to_spec(p: Param) -> FieldSpec:
+    kwargs = dict(description=p.variable, value=str(p.value))
+    if p.field_type == "dropdown":
+        widget = "Combobox" if p.allow_input else "Dropdown"
+        kwargs["options"] = p.options if p.options is not None else (str(p.value),)
+        if p.allow_input:
+            kwargs["continuous_update"] = False
+    elif p.field_type == "slider":
+        if integer_slider(p):
+            widget = "IntSlider"
+            kwargs.update(value=int(p.value), min=int(p.min), max=int(p.max), step=int(p.step))
+        else:
+            widget = "FloatSlider"
+            kwargs.update(value=p.value, min=p.min, max=p.max, step=p.step)
+        kwargs["continuous_update"] = False
+    elif p.field_type == "input":
+        if p.var_type == "boolean":
+            widget = "Checkbox"
+            kwargs["value"] = p.value
+        elif p.var_type == "date":
+            widget = "DatePicker"  # value stays an iso string
+        elif p.var_type == "integer" and _safe_integer(p.value):
+            widget = "IntText"
+            kwargs.update(value=p.value, continuous_update=False)
+        elif p.var_type == "number" and (_finite_float(p.value) or _safe_integer(p.value)):
+            widget = "FloatText"
+            kwargs.update(value=float(p.value), continuous_update=False)
+        else:
+            widget = "Text"
+            kwargs.update(continuous_update=False, placeholder=p.placeholder or "")
+    else:  # pragma: no cover
+        raise ValueError(f"Unknown field type: {p.field_type}")
+    return FieldSpec(
+        variable=p.variable, lineno=p.lineno, widget=widget, kwargs=kwargs, source=p.source
+    )
+
+
+def native_value(p: Param, v):
+    """Value of a native widget, as passed to the cell.
+
+    Number inputs written with an integer literal give integers while the value is integral,
+    so that e.g. `range(n)` keeps working.
+    """
+    v = NATIVE_TYPES[param_to_spec(p).widget](v)
+    if p.var_type == "number" and _safe_integer(p.value) and float(v).is_integer():
+        return int(v)
+    return v
+
+
+def integer_slider(p: Param) -> bool:
+    """Sliders with integer bounds, step and value give integers, like in Colab."""
+    return all(
+        float(x).is_integer() and abs(x) <= MAX_SAFE_INTEGER
+        for x in (p.min, p.max, p.step, p.value)
+    )
+
+
+def _safe_integer(v) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool) and abs(v) <= MAX_SAFE_INTEGER
+
+
+def _finite_float(v) -> bool:
+    return isinstance(v, float) and math.isfinite(v)
+
+
+def form_specs(form: Form) -> list[FieldSpec]:
+    """Returns the specs of all params of the form. Results are cached by cell code."""
+    key = "\n".join(form.code)
+    if key in _CACHE:
+        _CACHE.move_to_end(key)
+        return _CACHE[key]
+    specs = [param_to_spec(p) for p in form.params]
+    _CACHE[key] = specs
+    if len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return specs
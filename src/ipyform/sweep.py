@@ -0,0 +1,185 @@
+"""Runs a form cell for many combinations of its param values.
+
+The domain of each param comes from its annotation: dropdown options, slider steps and both
+booleans. Other inputs keep their current value.
+"""
+
+import ast
+import html
+import io
+import itertools
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Literal, Optional
+
+from ipyform.codegen import build_code, format_value
+from ipyform.entities import Form, Param
+from ipyform.isolate import WorkerPool
+from ipyform.specs import integer_slider
+
+
+@dataclass
+class SweepResult:
+    values: dict[str, str]
+    output: str = ""
+    result: Optional[str] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+def param_domain(p: Param) -> list[str]:
+    """Returns the values a param can take, formatted as python code."""
+    if p.field_type == "dropdown" and p.options is not None:
+        return [format_value(p, o) for o in p.options]
+    if p.field_type == "slider":
+        n = int(round((p.max - p.min) / p.step, 9)) + 1
+        values = [round(p.min + i * p.step, 12) for i in range(n)]
+        if integer_slider(p):
+            values = [int(v) for v in values]
+        return [format_value(p, v) for v in values]
+    if p.var_type == "boolean":
+        return ["True", "False"]
+    return [format_value(p, p.value)]
+
+
+def grid(form: Form) -> Iterator[dict[str, str]]:
+    """Yields every combination of param values."""
+    names = [p.variable for p in form.params]
+    for values in itertools.product(*(param_domain(p) for p in form.params)):
+        yield dict(zip(names, values))
+
+
+def random_samples(form: Form, n: int, seed: Optional[int] = None) -> Iterator[dict[str, str]]:
+    """Yields `n` combinations, drawing each param value uniformly from its domain."""
+    rng = random.Random(seed)
+    domains = {p.variable: param_domain(p) for p in form.params}
+    for _ in range(n):
+        yield {k: rng.choice(v) for k, v in domains.items()}
+
+
+def run_code(code: str, ns: dict) -> Optional[str]:
+    """Executes code like a notebook cell. Returns the repr of the last expression, if any."""
+    tree = ast.parse(code)
+    last = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        last = ast.Expression(tree.body.pop().value)
+    exec(compile(tree, "<form>", "exec"), ns)
+    if last is not None:
+        result = eval(compile(last, "<form>", "eval"), ns)
+        return None if result is None else repr(result)
+
+
+def run_sweep(
+    form: Form,
+    combinations: Iterable[dict[str, str]],
+    ns: Optional[dict] = None,
+    executor: Literal["thread", "process"] = "thread",
+    workers: int = 4,
+    timeout: Optional[float] = None,
+    stop: Optional[Callable[[SweepResult], bool]] = None,
+) -> Iterator[SweepResult]:
+    """Runs the cell for each combination and yields results as they complete.
+
+    - thread: each run gets a shallow copy of `ns`.
+    - process: each run gets the picklable entries of `ns` in a worker subprocess, like
+      `%%form --isolate`. Workers are killed once the sweep ends.
+
+    Threads can't be stopped, so runs with a `timeout` always use worker processes: a run
+    taking longer than `timeout` seconds is reported as failed and its worker is killed. No
+    new run is started once `stop` returns True for a result.
+    """
+    combinations = iter(combinations)
+    ns = ns or {}
+    pending = {}  # future -> values
+    pool = ThreadPoolExecutor(workers)
+    workers_pool = stdout = None
+    if executor == "thread" and timeout is None:
+        task = _run_in_thread
+        sys.stdout = stdout = _ThreadStdout(sys.stdout)
+    else:
+        workers_pool = WorkerPool(workers)
+
+        def task(code, ns):
+            r = workers_pool.run(code, ns, timeout=timeout)
+            return r.output, r.result, r.error, r.duration
+
+    def submit():
+        for values in itertools.islice(combinations, workers - len(pending)):
+            pending[pool.submit(task, build_code(form, values), ns)] = values
+
+    try:
+        submit()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            results = []
+            for fut in done:
+                values = pending.pop(fut)
+                try:
+                    results.append(SweepResult(values, *fut.result()))
+                except Exception as e:  # e.g. the worker process died
+                    results.append(SweepResult(values, error=f"{type(e).__name__}: {e}"))
+            stopped = False
+            for r in results:
+                yield r
+                stopped = stopped or (stop is not None and stop(r))
+            if stopped:
+                break
+            submit()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if workers_pool is not None:
+            workers_pool.close()
+        if stdout is not None:
+            sys.stdout = stdout.default
+
+
+def _execute(code: str, ns: dict) -> tuple[str, Optional[str], Optional[str], float]:
+    """Returns (stdout, result, error, duration). stdout must already be redirected."""
+    start = time.perf_counter()
+    result = error = None
+    try:
+        result = run_code(code, ns)
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+    return sys.stdout.getvalue(), result, error, time.perf_counter() - start
+
+
+def _run_in_thread(code: str, ns: dict):
+    sys.stdout.local.buffer = io.StringIO()
+    try:
+        return _execute(code, dict(ns))
+    finally:
+        sys.stdout.local.buffer = None
+
+
+class _ThreadStdout(io.TextIOBase):
+    """Routes writes of each worker thread to its own buffer."""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "buffer", None) or self.default
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def getvalue(self) -> str:
+        return self._target().getvalue()
+
+
+def results_table(form: Form, results: list[SweepResult]) -> str:
+    """Renders sweep results as an html table, one row per run."""
+    names = [p.variable for p in form.params if len(param_domain(p)) > 1]
+    header = "".join(f"<th>{h}</th>" for h in names + ["result", "output", "error", "time (s)"])
+    rows = []
+    for r in results:
+        cells = [r.values.get(n, "") for n in names]
+        cells += [r.result or "", r.output[-200:], r.error or "", f"{r.duration:.3f}"]
+        rows.append("<tr>" + "".join(f"<td>{html.escape(c)}</td>" for c in cells) + "</tr>")
+    return f"<table><tr>{header}</tr>{''.join(rows)}</table>"
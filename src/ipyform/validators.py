@@ -0,0 +1,79 @@
+"""Per-param validation of widget values, run on each change before the cell is rerun.
+
+The parser only checks the values written in the code. Values typed later by the user (free
+text in a `Text` field or a `Combobox` with `allow-input`) are checked here, so bad input is
+rejected in the kernel instead of failing inside the user code.
+"""
+
+from typing import Any, Callable, Optional
+
+from ipyform.entities import Param
+from ipyform.options import Options, option_set
+from ipyform.specs import NATIVE_TYPES, param_to_spec
+
+# Returns an error message, or None when the value is valid
+Validator = Callable[[Any], Optional[str]]
+
+
+def compile_validator(p: Param) -> Validator:
+    """Builds the validator of a param once, so that each check is a cheap call."""
+    if p.field_type == "dropdown":
+        if not p.allow_input and p.options is not None:
+            return _one_of(p.options)
+        if p.var_type == "raw":
+            return _expression
+    elif p.field_type == "slider":
+        return _in_range(p.min, p.max)
+    elif p.var_type in ("integer", "number", "raw"):
+        # Numbers rendered as `Text` hold code, e.g. `b = a + 1 # @param {type: "integer"}`
+        if param_to_spec(p).widget not in NATIVE_TYPES:
+            return _expression
+        return _integer if p.var_type == "integer" else _number
+    return _any
+
+
+def _one_of(options: Options) -> Validator:
+    allowed = option_set(options)
+
+    def validate(v):
+        if str(v) not in allowed:
+            return f"{v!r} is not one of the options"
+
+    return validate
+
+
+def _in_range(min_: float, max_: float) -> Validator:
+    def validate(v):
+        try:
+            v = float(v)
+        except (TypeError, ValueError):
+            return f"{v!r} is not a number"
+        if not min_ <= v <= max_:
+            return f"{v} is not in range [{min_}, {max_}]"
+
+    return validate
+
+
+def _integer(v) -> Optional[str]:
+    try:
+        int(str(v).strip())
+    except ValueError:
+        return f"{v!r} is not an integer"
+
+
+def _number(v) -> Optional[str]:
+    try:
+        float(str(v).strip())
+    except ValueError:
+        return f"{v!r} is not a number"
+
+
+def _expression(v) -> Optional[str]:
+    try:
+        compile(str(v), "<param>", "eval")
+    except SyntaxError:
+        return f"{v!r} is not a valid python expression"
+
+
+def _any(v) -> Optional[str]:
+    return None
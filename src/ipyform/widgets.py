@@ -1,13 +1,43 @@
+import asyncio
+import html
+import json
+import threading
 import uuid
+import weakref
 from dataclasses import dataclass
 from datetime import date
+from typing import Any, Callable, Iterable, Literal, Optional, Union
 
 import ipywidgets as w
 import markdown
 from IPython.display import HTML, display
 
 from ipyform import env
+from ipyform.codegen import build_code, format_value, split_sections
+from ipyform.diff import diff_forms
 from ipyform.entities import Form, Param
+from ipyform.isolate import Isolation
+from ipyform.output import BoundedOutput, OutputMode, bounded_output
+from ipyform.profiler import LineProfiler
+from ipyform.providers import LazyOptions, get_provider
+from ipyform.scheduler import SCHEDULER
+from ipyform.specs import (
+    DESCRIPTION_STYLE,
+    FIELD_LAYOUT,
+    NATIVE_TYPES,
+    FieldSpec,
+    form_specs,
+    native_value,
+    param_to_spec,
+)
+from ipyform.validators import compile_validator
+
+# on-change: rerun on each change. on-submit: rerun when the Run button is clicked.
+# on-idle: rerun once no value changed for `idle_delay` seconds.
+RerunPolicy = Literal["on-change", "on-submit", "on-idle"]
+
+# Forms created in the kernel. Closed forms are released once nothing else refers to them.
+LIVE_FORMS: "weakref.WeakSet[BaseFormWidget]" = weakref.WeakSet()
 
 
 @dataclass
@@ -15,103 +45,442 @@ class Field:
     param: Param
     widget: w.Widget
 
+    @property
+    def native(self) -> bool:
+        """True when the value is passed to the cell as is, see `specs.NATIVE_TYPES`."""
+        return type(self.widget).__name__ in NATIVE_TYPES
+
     def str_value(self) -> str:
-        v = self.widget.value
-        typ = self.param.var_type
-        if typ in ("boolean", "number", "integer", "raw"):
-            return str(v)
-        elif typ == "date":
-            return f'"{v.isoformat()}"'
-        elif typ == "string":
-            return f'"""{v}"""'
-        else:  # pragma: no cover
-            raise ValueError(f"Unknown type: {typ}")
+        return format_value(self.param, self.widget.value)
 
 
 def param_to_field(p: Param) -> Field:
-    kwargs = dict(
-        description=p.variable,
-        value=str(p.value),
-        style={"description_width": "150px"},
-        layout=dict(width="400px"),
+    return Field(param=p, widget=spec_to_widget(param_to_spec(p)))
+
+
+def build_fields(
+    data: Form, layout: Optional[w.Layout] = None, styles: Optional[dict] = None
+) -> list[Field]:
+    """Instantiates the widgets of all params from the (cached) specs of the form.
+
+    Widgets of the same class share one layout and one style model.
+    """
+    layout = layout or w.Layout(**FIELD_LAYOUT)
+    styles = {} if styles is None else styles
+    return [
+        Field(param=p, widget=shared_widget(spec, layout, styles))
+        for p, spec in zip(data.params, form_specs(data))
+    ]
+
+
+def shared_widget(spec: FieldSpec, layout: w.Layout, styles: dict) -> w.Widget:
+    """Instantiates a widget with the given layout, and the style of its class in `styles`."""
+    style_cls = getattr(w, spec.widget).class_traits()["style"].klass
+    if style_cls not in styles:
+        styles[style_cls] = style_cls(**DESCRIPTION_STYLE)
+    return spec_to_widget(spec, layout=layout, style=styles[style_cls])
+
+
+def spec_to_widget(spec: FieldSpec, layout=None, style=None) -> w.Widget:
+    return getattr(w, spec.widget)(
+        layout=layout or dict(FIELD_LAYOUT),
+        style=style or dict(DESCRIPTION_STYLE),
+        **widget_kwargs(spec),
     )
-    w_field = None
-    if p.field_type == "dropdown":
-        if p.allow_input:
-            w_field = w.Combobox(options=p.options, continuous_update=False, **kwargs)
-        else:
-            w_field = w.Dropdown(options=p.options, **kwargs)
-    elif p.field_type == "slider":
-        kwargs["value"] = p.value
-        w_field = w.FloatSlider(
-            min=p.min, max=p.max, step=p.step, continuous_update=False, **kwargs
+
+
+def widget_kwargs(spec: FieldSpec) -> dict[str, Any]:
+    kwargs = dict(spec.kwargs)
+    if spec.widget == "DatePicker":
+        kwargs["value"] = date.fromisoformat(kwargs["value"])
+    return kwargs
+
+
+def call_later(delay: float, fn: Callable, *args) -> Union[asyncio.TimerHandle, threading.Timer]:
+    """Calls `fn(*args)` after `delay` seconds. Returns a handle with a `cancel` method.
+
+    In a kernel, the call is scheduled on its event loop, so that it runs on the main thread
+    like the other reruns. Without a running loop (e.g. outside a kernel), a timer thread is used.
+    """
+    try:
+        return asyncio.get_running_loop().call_later(delay, fn, *args)
+    except RuntimeError:
+        timer = threading.Timer(delay, fn, args=args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+def title_html(title: str) -> str:
+    return markdown.markdown(title) if title.startswith("#") else f"<h2>{title}</h2>"
+
+
+class BaseFormWidget(w.Box):
+    """Rerun logic shared by the form backends.
+
+    Subclasses call `_setup` before building their children, and override `code_values` and
+    `native_values` to pass the values of their fields to the cell.
+    """
+
+    data: Form
+    ns: dict
+    output: w.Output
+    bounded_output: Optional[BoundedOutput]
+    message: w.HTML  # validation errors
+    toolbar: Optional[w.HBox]  # Run button and pending changes, unless rerun is on-change
+    priority: int = 0  # rerun priority, among forms waiting for the scheduler
+
+    def _setup(
+        self,
+        data: Form,
+        ns: dict,
+        output_mode: OutputMode,
+        max_output_lines: int,
+        rerun: RerunPolicy = "on-change",
+        idle_delay: float = 1.0,
+        isolation: Optional[Isolation] = None,
+        profile: bool = False,
+    ):
+        LIVE_FORMS.add(self)
+        self.data = data
+        self.ns = ns
+        self.output = w.Output()
+        self.bounded_output = bounded_output(self.output, output_mode, max_output_lines)
+        self.message = w.HTML()
+        self.validators = {p.variable: compile_validator(p) for p in data.params}
+        self.errors: dict[str, str] = {}
+
+        self.rerun = rerun
+        self.idle_delay = idle_delay
+        self.isolation = isolation  # run in a worker subprocess instead of the kernel
+        # Time of each line of the cell, shown under the form. Not available when isolated.
+        self.profiler = LineProfiler() if profile and isolation is None else None
+        self.profile_view = w.HTML() if self.profiler is not None else None
+        self.pending: set[str] = set()  # variables changed since the last run
+        self._timer: Optional[Union[asyncio.TimerHandle, threading.Timer]] = None  # on-idle
+        self.pending_label: Optional[w.HTML] = None
+        self.toolbar = None
+        if rerun != "on-change":
+            self.pending_label = w.HTML()
+        if rerun == "on-submit":
+            button = w.Button(description="Run", icon="play", button_style="primary")
+            button.on_click(self._submit)
+            self.toolbar = w.HBox([button, self.pending_label])
+        elif rerun == "on-idle":
+            self.toolbar = w.HBox([self.pending_label])
+
+    def validate(self, values: dict[str, Any]) -> bool:
+        """Checks the new values. Returns True when all the values of the form are valid."""
+        for k, v in values.items():
+            if err := self.validators[k](v):
+                self.errors[k] = err
+            else:
+                self.errors.pop(k, None)
+        self.message.value = "<br>".join(
+            f'<span style="color: red">{html.escape(k)}: {html.escape(err)}</span>'
+            for k, err in self.errors.items()
         )
-    elif p.field_type == "input":
-        if p.var_type == "boolean":
-            kwargs["value"] = p.value
-            w_field = w.Checkbox(**kwargs)
-        elif p.var_type == "date":
-            kwargs["value"] = date.fromisoformat(p.value)
-            w_field = w.DatePicker(**kwargs)
+        return not self.errors
+
+    def code_values(self) -> dict[str, str]:
+        """Returns the current value of each param, formatted as python code.
+
+        Params left out keep the value written in the cell.
+        """
+        return {}
+
+    def native_values(self) -> dict[str, Any]:
+        """Returns the params whose value is passed to the cell as is, not in `code_values`."""
+        return {}
+
+    def close(self):
+        """Closes the form and all its widgets, and drops its references to the cell state."""
+        if self.comm is not None:
+            if self._timer is not None:
+                self._timer.cancel()
+            SCHEDULER.forget(self)
+            self.output.outputs = ()
+            if self.profiler is not None:
+                self.profiler.close()
+            for widget in descendants(self)[1:]:
+                widget.close()
+            self.ns = {}
+        super().close()
+
+    def _changed(self, variables: Iterable[str]):
+        """Handles valid value changes, according to the rerun policy."""
+        self.pending.update(variables)
+        if self.rerun == "on-change":
+            self._rerun(None)
+            return
+        if self.rerun == "on-idle":
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = call_later(self.idle_delay, self._rerun, None)
+        self._show_pending()
+
+    def _submit(self, button):
+        if not self.errors:
+            self._rerun(None)
+
+    def _show_pending(self):
+        if self.pending_label is None:
+            return
+        changes = ", ".join(sorted(self.pending))
+        self.pending_label.value = f"Pending changes: {html.escape(changes)}" if changes else ""
+
+    def _rerun(self, evt):
+        """Queues a rerun of the cell with the current values."""
+        SCHEDULER.submit(self, self._execute, priority=self.priority)
+
+    def _execute(self):
+        self.pending.clear()
+        self._show_pending()
+        native = self.native_values()
+        code = build_code(self.data, self.code_values(), native=native)
+        self.ns.update(native)
+        if self.bounded_output is not None:
+            with self.bounded_output.capture():
+                self._run(code)
+            return
+        self.output.clear_output()
+        with self.output:
+            self._run(code)
+
+    def _run(self, code: str):
+        if self.isolation is not None:
+            self.isolation.exec(code, self.ns)
+        elif self.profiler is not None:
+            compiled = self.profiler.compile(code)
+            try:
+                with self.profiler.trace():
+                    exec(compiled, None, self.ns)
+            finally:
+                self.profile_view.value = self.profiler.table()
         else:
-            w_field = w.Text(**kwargs, continuous_update=False, placeholder=p.placeholder or "")
-    else:  # pragma: no cover
-        raise ValueError(f"Unknown field type: {p.field_type}")
-    return Field(param=p, widget=w_field)
+            exec(code, None, self.ns)
 
 
-class FormWidget(w.Box):
+class FormWidget(BaseFormWidget):
     def __init__(
         self,
         data: Form,
         ns: dict = globals(),
         layout=dict(display="grid", grid_template_columns="auto auto auto"),
+        output_mode: OutputMode = "full",
+        max_output_lines: int = 200,
+        rerun: RerunPolicy = "on-change",
+        idle_delay: float = 1.0,
+        isolation: Optional[Isolation] = None,
+        profile: bool = False,
     ):
-        self.data = data
-        self.fields = [param_to_field(p) for p in data.params]
-        self.output = w.Output()
-        self.ns = ns
-        elems = []
+        self._setup(data, ns, output_mode, max_output_lines, rerun, idle_delay, isolation, profile)
+        self._section_layout = layout
+        self._field_layout = w.Layout(**FIELD_LAYOUT)
+        self._styles = {}
+        self.fields = build_fields(data, self._field_layout, self._styles)
+        self._field_of = {f.widget.model_id: f for f in self.fields}
+        self.lazy_options = {}
+        for f in self.fields:
+            self._load_options(f)
+        self._updating = False
 
         # Hide code button
-        btn, code_collapse = hide_show_code_button()
-        elems.append(btn)
-
-        # Title
-        if data.title:
-            title = (
-                markdown.markdown(data.title)
-                if data.title.startswith("#")
-                else f"<h2>{data.title}</h2>"
-            )
-            elems.append(w.HTML(title))
+        self._button, code_collapse = hide_show_code_button()
+        self._boxes: list[w.Box] = []  # one per section
+        self._html: dict[str, w.HTML] = {}  # title and markdowns, by html
 
-        # Markdown and code
-        i_prev = 0
-        for md in data.markdowns:
-            fields = [f for f in self.fields if i_prev <= f.param.lineno < md.lineno]
-            if fields:
-                elems.append(w.Box([f.widget for f in fields], layout=layout))
-            elems.append(w.HTML(markdown.markdown(md.text)))
-            i_prev = md.lineno
-        fields = [f for f in self.fields if f.param.lineno >= i_prev]
-        elems.append(w.Box([f.widget for f in fields], layout=layout))
-        elems.append(self.output)
-
-        super().__init__([w.VBox(elems)])
+        super().__init__([w.VBox(self._children())])
         for f in self.fields:
-            f.widget.observe(self._rerun, names="value")
+            f.widget.observe(self._on_change, names="value")
         self._rerun(None)
         if data.display_mode == "form":
             code_collapse()
 
-    def _rerun(self, evt):
-        codes = list(self.data.code)
-        for f in self.fields:
-            codes[f.param.lineno - 1] = f"{f.param.variable} = {f.str_value()}"
-        self.output.clear_output()
-        with self.output:
-            exec("\n".join(codes), None, self.ns)
+    def code_values(self) -> dict[str, str]:
+        return {f.param.variable: f.str_value() for f in self.fields if not f.native}
+
+    def native_values(self) -> dict[str, Any]:
+        return {
+            f.param.variable: native_value(f.param, f.widget.value) for f in self.fields if f.native
+        }
+
+    def update(self, data: Form):
+        """Updates the form in place to a new version of the cell, then reruns it.
+
+        Only the fields and sections that changed are patched. Unchanged fields keep the
+        value set by the user.
+        """
+        d = diff_forms(self.data, data)
+        old = {id(f.param): f for f in self.fields}
+        fields = {}  # id(new param) -> field
+        rebuild = d.layout_changed or d.added or d.removed
+        self._updating = True
+        try:
+            for prev, p in d.kept:
+                fields[id(p)] = old[id(prev)]
+            for prev, p in d.changed:
+                f = old[id(prev)]
+                if not self._patch(f, prev, p):
+                    self._drop(f)
+                    f, rebuild = self._add(p), True
+                fields[id(p)] = f
+            for p in d.removed:
+                self._drop(old[id(p)])
+            for p in d.added:
+                fields[id(p)] = self._add(p)
+        finally:
+            self._updating = False
+        for p in data.params:
+            fields[id(p)].param = p
+        self.fields = [fields[id(p)] for p in data.params]
+        self.data = data
+        self.validators = {p.variable: compile_validator(p) for p in data.params}
+        self.errors = {}
+        # Values written in the code were accepted by the parser: only check the user's ones
+        valid = self.validate(
+            {
+                f.param.variable: f.widget.value
+                for f in self.fields
+                if f.widget.value != widget_kwargs(param_to_spec(f.param))["value"]
+            }
+        )
+        if rebuild:
+            self.children[0].children = self._children()
+        if valid:
+            self._rerun(None)
+
+    def _patch(self, f: Field, prev: Param, p: Param) -> bool:
+        """Updates the widget of a changed param. Returns False if it must be replaced."""
+        old_spec, spec = param_to_spec(prev), param_to_spec(p)
+        if old_spec.widget != spec.widget or prev.source or p.source:
+            return False
+        kwargs = widget_kwargs(spec)
+        value = kwargs.pop("value")
+        # Keep the value set by the user, unless the value in the code was changed
+        if prev.value == p.value and not compile_validator(p)(f.widget.value):
+            value = f.widget.value
+        with f.widget.hold_sync():
+            if p.field_type == "slider" and p.min > f.widget.max:
+                f.widget.max = p.max  # min can't be set above max
+            for k, v in kwargs.items():
+                if old_spec.kwargs.get(k) != spec.kwargs[k]:
+                    setattr(f.widget, k, v)
+            f.widget.value = value
+        return True
+
+    def _add(self, p: Param) -> Field:
+        f = Field(param=p, widget=shared_widget(param_to_spec(p), self._field_layout, self._styles))
+        self._field_of[f.widget.model_id] = f
+        self._load_options(f)
+        f.widget.observe(self._on_change, names="value")
+        return f
+
+    def _drop(self, f: Field):
+        f.widget.unobserve(self._on_change, names="value")
+        self._field_of.pop(f.widget.model_id, None)
+        self.lazy_options.pop(f.param.variable, None)
+        f.widget.close()  # layout and style are shared with the other fields
+
+    def _load_options(self, f: Field):
+        if f.param.source and (provider := get_provider(f.param.source, self.ns)):
+            self.lazy_options[f.param.variable] = LazyOptions(f.widget, provider)
+
+    def _children(self) -> list[w.Widget]:
+        """Lays out the form. Section boxes and html widgets are reused across updates."""
+        elems = [self._button]
+        html_widgets = {}
+        if self.data.title:
+            elems.append(self._html_widget(title_html(self.data.title), html_widgets))
+
+        # Markdown and code
+        widgets = {id(f.param): f.widget for f in self.fields}
+        n_boxes = 0
+        for params, md in split_sections(self.data):
+            if params or md is None:
+                children = tuple(widgets[id(p)] for p in params)
+                if n_boxes < len(self._boxes):
+                    self._boxes[n_boxes].children = children
+                else:
+                    self._boxes.append(w.Box(children, layout=self._section_layout))
+                elems.append(self._boxes[n_boxes])
+                n_boxes += 1
+            if md is not None:
+                elems.append(self._html_widget(markdown.markdown(md.text), html_widgets))
+        for box in self._boxes[n_boxes:]:
+            close_widget(box)
+        del self._boxes[n_boxes:]
+        for widget in self._html.values():
+            if widget not in html_widgets.values():
+                close_widget(widget)
+        self._html = html_widgets
+        if self.toolbar is not None:
+            elems.append(self.toolbar)
+        elems.append(self.message)
+        elems.append(self.output)
+        if self.profile_view is not None:
+            elems.append(self.profile_view)
+        return elems
+
+    def _html_widget(self, value: str, used: dict[str, w.HTML]) -> w.HTML:
+        used[value] = used.get(value) or self._html.get(value) or w.HTML(value)
+        return used[value]
+
+    def close(self):
+        if self.comm is not None:
+            for f in self.fields:
+                f.widget.unobserve(self._on_change, names="value")
+            self.lazy_options.clear()
+            # Styles of replaced fields may not be used by any widget anymore
+            for style in self._styles.values():
+                style.close()
+        super().close()
+
+    def _on_change(self, evt):
+        if self._updating:
+            return
+        field = self._field_of[evt["owner"].model_id]
+        lazy = self.lazy_options.get(field.param.variable)
+        if lazy is not None and lazy.intercept(evt):
+            return
+        SCHEDULER.focus(self)
+        if self.validate({field.param.variable: evt["new"]}):
+            self._changed([field.param.variable])
+
+
+def live_forms() -> list[BaseFormWidget]:
+    return [f for f in LIVE_FORMS if f.comm is not None]
+
+
+def descendants(widget: w.Widget) -> list[w.Widget]:
+    """Returns the widget, then its children, layouts and styles, recursively."""
+    out, seen, stack = [], set(), [widget]
+    while stack:
+        x = stack.pop()
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+        out.append(x)
+        stack.extend(reversed(getattr(x, "children", ())))
+        stack.extend(
+            m
+            for m in (getattr(x, "style", None), getattr(x, "layout", None))
+            if isinstance(m, w.Widget)
+        )
+    return out
+
+
+def close_widget(widget: w.Widget):
+    """Closes a widget with its layout and style, but not its children."""
+    for m in (widget.layout, getattr(widget, "style", None)):
+        if isinstance(m, w.Widget):
+            m.close()
+    widget.close()
+
+
+def state_size(form: BaseFormWidget) -> int:
+    """Approximate memory of a form: size of the state of its widgets, including outputs."""
+    return sum(len(json.dumps(x.get_state(), default=str)) for x in descendants(form))
 
 
 def hide_show_code_button():
@@ -119,6 +488,9 @@ def hide_show_code_button():
         return w.HTML(""), lambda: None
     id_ = "a" + str(uuid.uuid1())[:8]
     script = f"""<button onClick="code_toggle('{id_}')" id="{id_}">Hide/Show Code</button>"""
-    return w.HTML(script), lambda: display(
-        HTML(f"<script>setTimeout(function() {{ code_toggle('{id_}') }}, 1000);</script>")
-    )
+    return w.HTML(script), lambda: collapse_code(id_)
+
+
+def collapse_code(id_: str):
+    """Hides the code of the cell containing the element `id_`, once the output is rendered."""
+    display(HTML(f"<script>setTimeout(function() {{ code_toggle('{id_}') }}, 1000);</script>"))
@@ -0,0 +1,122 @@
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from inline_snapshot import snapshot
+
+from ipyform import env, parser
+from ipyform.anywidget_form import AnyFormWidget, form_to_json
+from ipyform.ipython_ext import form
+
+
+@pytest.mark.parametrize(
+    "cell,v0, v1,v2",
+    [
+        # Input
+        ('a = 1 # @param {type: "integer"}', 1, "1234", 1234),
+        ('a = True # @param {type: "boolean"}', True, False, False),
+        ('a = 1 # @param {type: "string"}', "1", "1234", "1234"),
+        ('a = 1 # @param {type: "raw"}', 1, "1 + 1", 2),
+        ('a = "2024-01-30" # @param {type: "date"}', "2024-01-30", "2020-10-01", "2020-10-01"),
+        ('a = "2024-01-30" # @param {type: "date"}', "2024-01-30", date(2020, 10, 1), "2020-10-01"),
+        # Dropdown
+        ('b = 2\na = 1 # @param [1, "b + 2"] {type: "raw"}', 1, "b + 2", 4),
+        ('a = 3 # @param [1, 2] {type: "string", "allow-input": true}', "3", "4", "4"),
+        # Slider
+        ('a = 1 # @param {type: "slider"}', 1, 55, 55),
+    ],
+)
+def test_form_single(cell, v0, v1, v2):
+    env = {}
+    f = AnyFormWidget(parser.parse(cell), ns=env)
+    assert env["a"] == v0
+
+    f._on_msg(f.model, {"type": "update", "values": {"a": v1}}, [])
+    assert env["a"] == v2
+
+
+def test_delta_reruns_once():
+    env = {"n": 0}
+    cell = "a = 1 # @param\nb = 2 # @param\nn += 1\nc = a + b"
+    f = AnyFormWidget(parser.parse(cell), ns=env)
+    assert (env["n"], env["c"]) == (1, 3)
+
+    f._on_msg(f.model, {"type": "update", "values": {"a": "10", "b": "20", "unknown": 1}}, [])
+    assert (env["n"], env["c"]) == (2, 30)
+    assert "unknown" not in env
+
+    f._on_msg(f.model, {"type": "other"}, [])
+    assert env["n"] == 2
+
+
+@patch.object(env, "IN_VSCODE", True)
+def test_form_to_json():
+    cell = """
+# @title MyTitle { display-mode: "form" }
+# @markdown ### subtitle
+a = 1 # @param {type: integer}
+# @markdown ### subtitle2
+b = "x" # @param ["x", "y"] {"allow-input": true}
+c = True # @param {type: "boolean"}
+d = 0.5 # @param {type: "slider", min: 0, max: 1, step: 0.1}
+e = "2024-01-01" # @param {type: "date"}
+f = "v" # @param ["v"]
+"""
+    assert form_to_json(parser.parse(cell), col=2) == snapshot(
+        {
+            "title": "<h2>MyTitle</h2>",
+            "col": 2,
+            "toggle_id": None,
+            "sections": [
+                {"fields": [], "markdown": "<h3>subtitle</h3>"},
+                {
+                    "fields": [{"variable": "a", "value": 1, "kind": "int"}],
+                    "markdown": "<h3>subtitle2</h3>",
+                },
+                {
+                    "fields": [
+                        {"variable": "b", "value": "x", "kind": "combobox", "options": ["x", "y"]},
+                        {"variable": "c", "value": True, "kind": "checkbox"},
+                        {
+                            "variable": "d",
+                            "value": 0.5,
+                            "kind": "slider",
+                            "min": 0.0,
+                            "max": 1.0,
+                            "step": 0.1,
+                        },
+                        {"variable": "e", "value": "2024-01-01", "kind": "date"},
+                        {"variable": "f", "value": "v", "kind": "dropdown", "options": ["v"]},
+                    ],
+                    "markdown": None,
+                },
+            ],
+        }
+    )
+
+
+def test_native_values():
+    env = {}
+    cell = 'a = 1 # @param {type: "integer"}\nb = 1 # @param {type: "number"}\nc = a + b'
+    f = AnyFormWidget(parser.parse(cell), ns=env)
+    f.update_values({"a": 3, "b": 2})  # numbers sent by the browser
+    assert (env["a"], env["b"], env["c"]) == (3, 2, 5) and type(env["b"]) is int  # literal type
+    f.update_values({"b": 2.5})
+    assert env["c"] == 5.5
+    f.update_values({"a": ""})  # empty input
+    assert env["a"] == 3 and "is not an integer" in f.message.value
+    f.close()
+
+
+@patch.object(env, "IN_VSCODE", False)
+def test_collapse_code():
+    with patch("ipyform.anywidget_form.collapse_code") as collapse:
+        f = AnyFormWidget(parser.parse('# @title T { display-mode: "form" }\na = 1 # @param'))
+    collapse.assert_called_once_with(f.model.spec["toggle_id"])
+
+
+def test_form_magic_backend():
+    env = {}
+    f = form("--backend anywidget", "foo = 1 # @param", local_ns=env)
+    assert isinstance(f, AnyFormWidget)
+    assert env["foo"] == 1
@@ -0,0 +1,64 @@
+from inline_snapshot import snapshot
+
+from ipyform import parser
+from ipyform.diff import diff_forms, same_field
+
+CELL = """# @title T
+a = 1 # @param {type: "integer"}
+b = "x" # @param ["x", "y"]
+# @markdown Section
+c = 0.5 # @param {type: "slider", min: 0, max: 1, step: 0.1}
+"""
+
+
+def _summary(d):
+    return dict(
+        kept=[new.variable for _, new in d.kept],
+        changed=[new.variable for _, new in d.changed],
+        added=[p.variable for p in d.added],
+        removed=[p.variable for p in d.removed],
+        layout_changed=d.layout_changed,
+    )
+
+
+def test_same_form():
+    d = diff_forms(parser.parse(CELL), parser.parse(CELL))
+    assert d.empty
+    assert _summary(d)["kept"] == ["a", "b", "c"]
+
+
+def test_moved_params_are_kept():
+    d = diff_forms(parser.parse(CELL), parser.parse("x = 0\n" + CELL))
+    assert d.empty
+    assert same_field(*d.kept[0])
+
+
+def test_diff():
+    new = CELL.replace('["x", "y"]', '["x", "z"]').replace("a = 1", "a = 2")
+    new = new.replace("# @markdown Section\n", "# @markdown Other\nd = True # @param\n")
+    new = new.replace("# @title T\n", "")
+    assert _summary(diff_forms(parser.parse(CELL), parser.parse(new))) == snapshot(
+        {
+            "kept": ["c"],
+            "changed": ["a", "b"],
+            "added": ["d"],
+            "removed": [],
+            "layout_changed": True,
+        }
+    )
+
+
+def test_removed_and_duplicated_variables():
+    old = parser.parse("a = 1 # @param\nb = 2 # @param\na = 3 # @param")
+    new = parser.parse("a = 1 # @param\na = 3 # @param")
+    d = diff_forms(old, new)
+    assert _summary(d) == snapshot(
+        {"kept": ["a", "a"], "changed": [], "added": [], "removed": ["b"], "layout_changed": True}
+    )
+    assert [(o.lineno, n.lineno) for o, n in d.kept] == [(1, 1), (3, 2)]
+
+
+def test_section_change():
+    new = CELL.replace("# @markdown Section\n", "").replace("a = 1", "# @markdown Section\na = 1")
+    d = diff_forms(parser.parse(CELL), parser.parse(new))
+    assert (d.changed, d.added, d.removed, d.layout_changed) == ([], [], [], True)
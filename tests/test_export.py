@@ -0,0 +1,81 @@
+import json
+import re
+
+from inline_snapshot import snapshot
+
+from ipyform import parser
+from ipyform.export import MISSING, combinations, export_html, precompute
+from ipyform.ipython_ext import form_export
+from ipyform.sweep import SweepResult
+
+CELL = """# @title My form
+a = "y" # @param ["x", "y"]
+b = 0.1 # @param {type: "slider", min: 0, max: 0.3, step: 0.1}
+# @markdown Some text
+c = True # @param {type: "boolean"}
+d = "<b>" # @param {type: "string"}
+print(a, b, c)
+"""
+
+
+def _data(out: str) -> dict:
+    return json.loads(re.search(r'<script type="application/json">(.*?)</script>', out)[1])
+
+
+def test_combinations():
+    form = parser.parse(CELL)
+    runs = list(combinations(form))
+    assert len(runs) == 2 * 4 * 2
+    assert runs[0] == {"a": '"""y"""', "b": "0.1", "c": "True", "d": '"""<b>"""'}
+    assert runs.count(runs[0]) == 1
+
+
+def test_export_html_without_outputs():
+    out = export_html(parser.parse(CELL))
+    assert "<h2>My form</h2>" in out
+    assert "<p>Some text</p>" in out
+    assert '<option value="1" selected>y</option>' in out
+    assert 'value="1" data-labels=' in out and "<span>0.1</span>" in out
+    assert '<input type="checkbox" checked data-var="c">' in out
+    assert '<input type="text" value="&lt;b&gt;" data-var="d" disabled>' in out
+    assert "<script" not in out
+
+
+def test_export_html_outputs():
+    form = parser.parse(CELL)
+    results = precompute(form, max_runs=5)
+    assert len(results) == 5
+    out = export_html(form, results + [SweepResult({"a": '"""z"""'}, output="unknown")])
+    data = _data(out)
+    assert len(data["index"]) == 5
+    assert data["outputs"][data["index"]["1,1,0,0"]] == snapshot("<pre>y 0.1 True\n</pre>")
+    assert '<div class="ipyform-output"><pre>y 0.1 True\n</pre></div>' in out
+
+
+def test_export_html_deduplicates_outputs():
+    form = parser.parse(CELL)
+    results = [SweepResult(values, output="same") for values in combinations(form)]
+    results[0] = SweepResult(results[0].values, error="ValueError: </script>")
+    data = _data(export_html(form, results))
+    assert len(data["index"]) == 16
+    assert data["outputs"] == snapshot(
+        ['<pre style="color: red">ValueError: &lt;/script&gt;</pre>', "<pre>same</pre>"]
+    )
+
+
+def test_export_html_current_values_not_computed():
+    form = parser.parse(CELL)
+    runs = list(combinations(form))
+    out = export_html(form, [SweepResult(runs[1], output="other")])
+    assert f'<div class="ipyform-output">{MISSING}</div>' in out
+
+
+def test_form_export_magic(tmp_path, capsys):
+    path = tmp_path / "form.html"
+    form_export(f"--max-runs 2 -o {path}", CELL, local_ns={})
+    data = _data(path.read_text())
+    assert len(data["index"]) == 2
+    assert len(data["outputs"]) == 2
+
+    form_export(f"--no-outputs -o {path}", CELL, local_ns={})
+    assert "ipyform-output" not in path.read_text()
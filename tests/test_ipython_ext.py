@@ -1,12 +1,16 @@
+import gc
+
 import pytest
 from IPython.testing.globalipapp import get_ipython
+from ipywidgets.widgets.widget import _instances
 
-from ipyform import env
+from ipyform import env, ipython_ext, isolate
 from ipyform.ipython_ext import (
     CONFIG,
     comment_magic_transformer,
     form,
     form_config,
+    form_gc,
     load_ipython_extension,
 )
 
@@ -17,6 +21,90 @@ def test_form():
     assert env["foo"] == 1
 
 
+def test_form_rerun_updates_widget(monkeypatch):
+    monkeypatch.setattr(ipython_ext, "_cell_id", lambda: "cell-1")
+    env = {}
+    f = form("", "foo = 1 # @param\nbar = 2 # @param", local_ns=env)
+    f.fields[0].widget.value = "3"
+    assert form("", "foo = 1 # @param\nbar = 4 # @param", local_ns=env) is f
+    assert (env["foo"], env["bar"]) == (3, 4)
+    # Other options: new widget
+    assert form("--col 2", "foo = 1 # @param", local_ns=env) is not f
+
+    monkeypatch.setattr(ipython_ext, "_cell_id", lambda: None)
+    assert form("--col 2", "foo = 1 # @param", local_ns=env) is not form(
+        "--col 2", "foo = 1 # @param", local_ns=env
+    )
+
+
+def test_form_replaced_is_closed(monkeypatch):
+    monkeypatch.setattr(ipython_ext, "_cell_id", lambda: "cell-2")
+    f = form("", "foo = 1 # @param", local_ns={})
+    g = form("--backend anywidget", "foo = 1 # @param", local_ns={})
+    assert f.comm is None and g.comm is not None
+    assert form("", "foo = 1 # @param", local_ns={}) is not g
+    assert g.comm is None
+
+
+def test_memory_is_flat_over_reruns(monkeypatch):
+    monkeypatch.setattr(ipython_ext, "_cell_id", lambda: "cell-3")
+    cells = [
+        "a = 1 # @param [1, 2] {type: 'raw'}\nprint(a)",
+        "# @markdown Text\na = 2 # @param {type: 'integer'}\nb = 'x' # @param ['x']\nprint(a)",
+    ]
+
+    def rerun(i):
+        # updated in place, or replaced when the options change
+        form("--col 2" if i % 3 == 0 else "", cells[i % 2], local_ns={})
+
+    for i in range(100):
+        rerun(i)
+    gc.collect()
+    n_instances, n_objects = len(_instances), len(gc.get_objects())
+    for i in range(1000):
+        rerun(i)
+    gc.collect()
+    assert len(_instances) == n_instances
+    assert len(gc.get_objects()) - n_objects < 100
+
+
+def test_form_isolate():
+    env = {"offset": 1}
+    f = form("--isolate --timeout 5", "foo = 1 # @param\nbar = foo + offset", local_ns=env)
+    assert f.isolation.timeout == 5 and f.isolation.pool is isolate.shared_pool()
+    assert env["bar"] == 2
+    assert form("", "foo = 1 # @param", local_ns={}).isolation is None
+    assert form("--isolate --profile", "foo = 1 # @param", local_ns={}).profiler is None
+
+
+def test_form_profile():
+    f = form("--profile --backend anywidget", "foo = 1 # @param\nbar = foo", local_ns={})
+    assert "<td>bar = foo</td>" in f.profile_view.value
+
+
+def test_form_gc(capsys):
+    form("", "foo = 1 # @param", local_ns={})
+    form_gc("")
+    assert "KiB" in capsys.readouterr().out
+    form_gc("--close-all")
+    assert "Closed" in capsys.readouterr().out
+    form_gc("")
+    assert capsys.readouterr().out == "0 live forms, 0 widgets, 0.0 KiB\n"
+
+
+def test_form_output_mode():
+    old_config = dict(CONFIG)
+    try:
+        form_config("--output last --max-lines 1")
+        f = form("", "foo = 1 # @param\nprint(foo)\nprint(foo)", local_ns={})
+        assert f.bounded_output.last_display_only
+        assert f.output.outputs[0]["text"] == "... 1 lines truncated ...\n1\n"
+        f = form("--output full", "foo = 1 # @param", local_ns={})
+        assert f.bounded_output is None
+    finally:
+        CONFIG.update(old_config)
+
+
 def test_form_with_error(caplog):
     env = {}
     form("--col 1", "foo = 1 # @param [2, 3]", local_ns=env)
@@ -27,9 +115,17 @@ def test_form_with_error(caplog):
 def test_form_config():
     old_config = dict(CONFIG)
     try:
-        form_config("--col 13 --auto-detect 1")
+        form_config("--col 13 --auto-detect 1 --backend anywidget")
         assert CONFIG["auto_detect"] == 1
         assert CONFIG["col"] == 13
+        assert CONFIG["backend"] == "anywidget"
+        assert CONFIG["rerun"] == "on-change"
+        assert CONFIG["include"] is None and CONFIG["exclude"] is None
+        form_config("--rerun on-idle --idle-delay 0.5")
+        f = form("", "foo = 1 # @param", local_ns={})
+        assert (f.rerun, f.idle_delay) == ("on-idle", 0.5)
+        f = form("--rerun on-submit --backend ipywidgets", "foo = 1 # @param", local_ns={})
+        assert f.rerun == "on-submit" and f.toolbar is not None
     finally:
         CONFIG.update(old_config)
 
@@ -74,6 +170,38 @@ def test_comment_magic_transformer_auto_detect(lines, exp):
         CONFIG.update(old_config)
 
 
+def test_comment_magic_transformer_include_exclude():
+    old_config = dict(CONFIG)
+    cells = [["# plot\n", "a = 1 # @param\n"], ["# train\n", "a = 1 # @param\n"]]
+    try:
+        form_config("--auto-detect 1 --include ^#\\s(plot|train) --exclude ^#\\strain")
+        assert [comment_magic_transformer(c)[0] for c in cells] == ["%%form", "# train\n"]
+        form_config("--auto-detect 1 --include ^#\\splot")
+        assert comment_magic_transformer(["a = 1 # @param\n"]) == ["a = 1 # @param\n"]
+    finally:
+        CONFIG.update(old_config)
+
+
+def test_comment_magic_transformer_cache(monkeypatch):
+    monkeypatch.setattr(ipython_ext, "_DECISIONS", type(ipython_ext._DECISIONS)())
+    monkeypatch.setattr(ipython_ext, "DECISION_CACHE_SIZE", 2)
+    monkeypatch.setitem(CONFIG, "auto_detect", True)
+    calls = []
+    decide = ipython_ext._decide
+    monkeypatch.setattr(ipython_ext, "_decide", lambda *args: calls.append(1) or decide(*args))
+
+    cells = [[f"a = {i} # @param\n"] for i in range(3)]
+    for _ in range(5):
+        assert comment_magic_transformer(cells[0]) == ["%%form"] + cells[0]
+        assert comment_magic_transformer(["print(1)\n"]) == ["print(1)\n"]  # not even hashed
+    assert len(calls) == 1
+    # Same cell, other config: decided again
+    monkeypatch.setitem(CONFIG, "auto_detect", False)
+    assert comment_magic_transformer(cells[0]) == cells[0]
+    assert comment_magic_transformer(["#! %%form\n", "a = 1\n"]) == ["%%form\n", "a = 1\n"]
+    assert len(calls) == 3 and len(ipython_ext._DECISIONS) == 2  # bounded
+
+
 @pytest.mark.parametrize(
     "lines,exp",
     [
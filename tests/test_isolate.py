@@ -0,0 +1,76 @@
+import os
+import signal
+
+import pytest
+
+from ipyform import isolate, parser
+from ipyform.isolate import Isolation, WorkerError, WorkerPool
+from ipyform.widgets import FormWidget
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(size=1)
+    yield pool
+    pool.close()
+
+
+def test_run(pool):
+    ns = {"a": 1, "os": os, "f": lambda: 1}
+    r = pool.run("print('hi', a)\nb = a + 1\nc = os.getpid()", ns)
+    assert (r.output, r.error) == ("hi 1\n", None)
+    assert isolate.loads(r.ns) == {"b": 2, "c": pool.pids[0]}
+    assert pool.pids[0] != os.getpid()
+
+    r = pool.run("1 / 0", {})
+    assert r.error == "ZeroDivisionError: division by zero"
+
+
+def test_cell_namespace():
+    ns = {"a": 1, "b": 2, "f": len, "unused": [0] * 10, "In": [], "Out": {}}
+    code = "def g():\n    return f(b)\nc = a + g()\nprint(In, Out, missing)"
+    assert isolate.cell_namespace(code, ns) == {"a": 1, "b": 2, "f": len}
+    assert isolate.cell_namespace("a +", ns) == {}
+
+
+def test_timeout(pool):
+    pid = pool.pids[0]
+    r = pool.run("import time\ntime.sleep(10)", {}, timeout=0.2)
+    assert r.error == "TimeoutError: exceeded 0.2s"
+    assert pool.pids[0] != pid
+    assert pool.run("print(1)", {}).output == "1\n"
+
+
+@pytest.mark.skipif(isolate.resource is None, reason="no RLIMIT_AS")
+def test_memory_limit(pool):
+    code = "print(len(bytearray(300 * 2**20)) > 0)"
+    assert pool.run(code, {}, memory_limit=200).error.startswith("MemoryError")
+    assert pool.run(code, {}).output == "True\n"  # the limit only applies to one run
+
+
+def test_crash(pool):
+    pid = pool.pids[0]
+    r = pool.run(f"import os\nos.kill(os.getpid(), {signal.SIGSEGV.value})", {})
+    assert r.error == f"WorkerError: worker died with exit code {-signal.SIGSEGV.value}"
+    assert pool.pids[0] != pid
+    assert pool.run("print(1)", {}).output == "1\n"
+
+
+def test_isolation_exec(pool, capsys):
+    ns = {"a": 1}
+    Isolation(pool).exec("print(a)\na = 2\nb = a", ns)
+    assert ns == {"a": 2, "b": 2} and capsys.readouterr().out == "1\n"
+    with pytest.raises(WorkerError, match="NameError"):
+        Isolation(pool).exec("a = 3\nprint(x)", ns)
+    assert ns["a"] == 3
+
+
+def test_form_widget(pool):
+    ns = {"offset": 10}
+    cell = "a = 1 # @param {type: 'integer'}\nb = a + offset\nprint(b)"
+    f = FormWidget(parser.parse(cell), ns=ns, isolation=Isolation(pool), output_mode="bounded")
+    assert ns["b"] == 11
+    f.fields[0].widget.value = "5"
+    assert ns["b"] == 15
+    assert f.output.outputs[0]["text"] == "15\n"
+    f.close()
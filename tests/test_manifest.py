@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+from inline_snapshot import snapshot
+
+from ipyform import manifest
+from ipyform.manifest import INDEX_NAME, file_forms, main, scan
+
+CODE = """import os
+
+# %%
+#! %%form
+# @title Settings
+a = "x" # @param ["x", "y"]
+b = 1 # @param {type: "slider", min: 0, max: 10}
+
+# %%
+print("not a form")  # @param
+
+# %%
+#! %%form
+c = 5 # @param ["1", "2"]
+"""
+
+
+def _write(path, code):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(code)
+
+
+def test_file_forms():
+    forms = file_forms("f.py", CODE)
+    assert [(f["path"], f["lineno"], f["title"]) for f in forms] == snapshot(
+        [("f.py", 3, "Settings"), ("f.py", 12, None)]
+    )
+    assert [(p["variable"], p["lineno"]) for p in forms[0]["params"]] == [("a", 6), ("b", 7)]
+    assert forms[1]["errors"] == [{"lineno": 14, "error": "Value 5 not in options: ['1', '2']"}]
+
+    forms = file_forms("f.py", "#! %%form\nx = (\n")
+    assert forms[0]["errors"][0]["lineno"] == 2
+
+
+def test_scan_is_incremental(tmp_path):
+    _write(tmp_path / "a.py", CODE)
+    _write(tmp_path / "pkg" / "b.py", "#! %%form\nx = 1 # @param {type: 'integer'}\n")
+    _write(tmp_path / "pkg" / "c.py", "x = 1\n")
+    _write(tmp_path / ".venv" / "d.py", CODE)
+    _write(tmp_path / "notes.txt", CODE)
+
+    result = scan(str(tmp_path))
+    assert (result.files, result.parsed) == (3, 3)
+    assert [(f["path"], f["lineno"]) for f in result.forms] == snapshot(
+        [("a.py", 3), ("a.py", 12), ("pkg/b.py", 1)]
+    )
+    assert (tmp_path / INDEX_NAME).exists()
+
+    assert scan(str(tmp_path)).parsed == 0
+
+    # Touched without changes: hashed, but not parsed
+    os.utime(tmp_path / "a.py", ns=(0, 0))
+    assert scan(str(tmp_path)).parsed == 0
+
+    _write(tmp_path / "pkg" / "b.py", "#! %%form\ny = 2 # @param {type: 'integer'}\n")
+    (tmp_path / "pkg" / "c.py").unlink()
+    result = scan(str(tmp_path))
+    assert (result.files, result.parsed) == (2, 1)
+    assert result.forms[-1]["params"][0]["variable"] == "y"
+
+
+def test_scan_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, "MIN_PARALLEL", 2)
+    for i in range(5):
+        _write(tmp_path / f"f{i}.py", f"#! %%form\nx{i} = 1 # @param\n")
+    result = scan(str(tmp_path), index_path=str(tmp_path / "index.json"), workers=2)
+    assert (result.files, result.parsed) == (5, 5)
+    assert [f["params"][0]["variable"] for f in result.forms] == ["x0", "x1", "x2", "x3", "x4"]
+
+
+def test_noop_scan_is_fast(tmp_path):
+    for i in range(2000):
+        _write(tmp_path / f"d{i % 20}" / f"f{i}.py", f"x = {i}\n")
+    scan(str(tmp_path))
+    start = time.perf_counter()
+    assert scan(str(tmp_path)).parsed == 0
+    assert time.perf_counter() - start < 0.5
+
+
+def test_main(tmp_path, capsys):
+    _write(tmp_path / "a.py", CODE)
+    out = tmp_path / "forms.json"
+    assert main([str(tmp_path), "-o", str(out)]) == 0
+    assert len(json.loads(out.read_text())["forms"]) == 2
+    assert "a.py:14: Value 5 not in options" in capsys.readouterr().err
+
+    assert main([str(tmp_path), "--check"]) == 1
+    assert json.loads(capsys.readouterr().out)["forms"][0]["title"] == "Settings"
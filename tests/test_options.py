@@ -0,0 +1,37 @@
+from ipyform import options, parser
+from ipyform.options import intern_options, option_set
+from ipyform.widgets import FormWidget
+
+
+def test_intern_options():
+    a = intern_options([1, "2", 3.5])
+    assert a == ("1", "2", "3.5")
+    assert intern_options(("1", "2", "3.5")) is a
+    assert option_set(a) is option_set(intern_options(["1", "2", "3.5"]))
+    assert option_set(("1", "2", "3.5")) == {"1", "2", "3.5"}  # equal, not interned
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(options, "_CACHE", type(options._CACHE)())
+    monkeypatch.setattr(options, "CACHE_SIZE", 2)
+    a = intern_options(["a"])
+    intern_options(["b"])
+    assert intern_options(["a"]) is a  # most recently used
+    intern_options(["c"])
+    assert list(options._CACHE) == [("a",), ("c",)]
+
+
+def test_options_are_shared_across_forms():
+    cell = (
+        "m = 'x' # @param ['x', 'y', 'z']\nn = 'y' # @param ['x', 'y', 'z'] {'allow-input': true}"
+    )
+    f1 = parser.parse(cell)
+    f2 = next(parser.parse_many(["print(1)\n" + cell]))
+    shared = f1.params[0].options
+    assert all(p.options is shared for p in f1.params + f2.params)
+
+    w1, w2 = FormWidget(f1, ns={}), FormWidget(f2, ns={})
+    assert w1.fields[0].widget.options is shared
+    assert w2.fields[0].widget.options is shared
+    w1.close()
+    w2.close()
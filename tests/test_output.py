@@ -0,0 +1,98 @@
+import sys
+import time
+
+import ipywidgets as w
+import pytest
+from inline_snapshot import snapshot
+from IPython import get_ipython
+from IPython.display import display
+from IPython.testing import globalipapp
+
+from ipyform import parser
+from ipyform.output import MAX_LINE_LENGTH, BoundedOutput
+from ipyform.widgets import FormWidget
+
+
+def test_ring_buffer():
+    out = BoundedOutput(w.Output(), max_lines=3)
+    with out.capture():
+        for i in range(10):
+            print(i, end="")
+            print()
+        print("err", file=sys.stderr)
+        print("a", end="")
+        print("b")
+    assert out.widget.outputs == snapshot(
+        (
+            {"output_type": "stream", "name": "stdout", "text": "... 9 lines truncated ...\n9\n"},
+            {"output_type": "stream", "name": "stderr", "text": "err\n"},
+            {"output_type": "stream", "name": "stdout", "text": "ab\n"},
+        )
+    )
+
+    # The buffer is reset on each run
+    with out.capture():
+        print("x" * (MAX_LINE_LENGTH + 10))
+    assert out.widget.outputs[0]["text"] == "x" * MAX_LINE_LENGTH + "... (line truncated)\n"
+
+
+def test_rate_limited_flush():
+    out = BoundedOutput(w.Output(), flush_interval=1000)
+    with out.capture():
+        print("a")
+        assert out.widget.outputs == ()
+        out._last_flush -= 1000
+        sys.stdout.write("b\n")
+        assert out.widget.outputs[0]["text"] == "a\nb\n"
+        print("c")
+        assert out.widget.outputs[0]["text"] == "a\nb\n"
+    assert out.widget.outputs[0]["text"] == "a\nb\nc\n"
+
+
+def test_trailing_flush():
+    out = BoundedOutput(w.Output(), flush_interval=0.05)
+    with out.capture():
+        print("a")
+        print("b")  # throttled
+        time.sleep(0.5)
+        assert out.widget.outputs[0]["text"] == "a\nb\n"
+    assert out._timer is None
+
+
+def test_exception_without_shell(monkeypatch):
+    monkeypatch.setattr("ipyform.output.get_ipython", lambda: None)
+    out = BoundedOutput(w.Output())
+    with pytest.raises(ZeroDivisionError):
+        with out.capture():
+            print("before")
+            1 / 0
+    assert out.widget.outputs[0]["text"] == "before\n"
+    assert "ZeroDivisionError" in out.widget.outputs[1]["text"]
+
+
+@pytest.mark.parametrize("last_display_only,exp", [(False, ["a", "b"]), (True, ["b"])])
+def test_displays(ipython, last_display_only, exp):
+    out = BoundedOutput(w.Output(), last_display_only=last_display_only)
+    with out.capture():
+        display({"text/html": "a"}, raw=True)
+        display({"text/html": "b"}, raw=True)
+        1 / 0
+    displays = [o for o in out.widget.outputs if o["output_type"] == "display_data"]
+    assert [d["data"]["text/html"] for d in displays] == exp
+    assert "ZeroDivisionError" in out.widget.outputs[0]["text"]
+
+
+@pytest.mark.parametrize("mode", ["bounded", "last"])
+def test_form_output_mode(mode):
+    cell = "n = 3 # @param\nfor i in range(n):\n    print(i)"
+    f = FormWidget(parser.parse(cell), ns={}, output_mode=mode, max_output_lines=2)
+    assert f.output.outputs[0]["text"] == "... 1 lines truncated ...\n1\n2\n"
+
+
+@pytest.fixture(scope="module")
+def ipython():
+    # The global app can only be started once per session
+    ip = get_ipython() or globalipapp.get_ipython()
+    if ip is None:
+        pytest.skip("IPython not available")
+    yield ip
@@ -4,7 +4,13 @@ import pytest
 from inline_snapshot import snapshot
 
 from ipyform.entities import Form, Markdown, Param
-from ipyform.parser import _extract_title_and_display_mode, _parse_comment, _try_consume_json, parse
+from ipyform.parser import (
+    _extract_title_and_display_mode,
+    _parse_comment,
+    _try_consume_json,
+    parse,
+    parse_many,
+)
 
 
 @pytest.mark.parametrize(
@@ -212,7 +218,7 @@ a02 = False # @param {"type":"boolean"}
                 var_type="raw",
                 variable="a11",
                 value="a01",
-                options=["1", "2", "a01", "1 + 1"],
+                options=("1", "2", "a01", "1 + 1"),
             ),
         ),
         (
@@ -224,7 +230,7 @@ a02 = False # @param {"type":"boolean"}
                 var_type="string",
                 variable="a12",
                 value="1",
-                options=["1", "a]"],
+                options=("1", "a]"),
             ),
         ),
         (
@@ -236,7 +242,7 @@ a02 = False # @param {"type":"boolean"}
                 var_type="raw",
                 variable="a13",
                 value="a01",
-                options=["1", "a01"],
+                options=("1", "a01"),
                 allow_input=True,
             ),
         ),
@@ -249,7 +255,7 @@ a02 = False # @param {"type":"boolean"}
                 var_type="string",
                 variable="a14",
                 value="1234",
-                options=["1", "a01"],
+                options=("1", "a01"),
                 allow_input=True,
             ),
         ),
@@ -334,3 +340,42 @@ def test_parse_ignore(code):
     assert len(form.params) == 0
     assert len(form.errors) == 0
     assert form.code == code.splitlines()
+
+
+def test_parse_many():
+    cells = [
+        "# @title A\na = 'x' # @param ['x', 'y']\nb = 1 # @param {type: 'slider'}",
+        "print(1)",
+        "%pip install foo",
+        "a = 'y' # @param ['x', 'y']\nb = 200 # @param {type: 'slider'}",
+        "c = 1 # @param [2, 3]\n# @markdown Text",
+        "c = 1 # @param [2, 3]",
+    ]
+    forms = list(parse_many(cells))
+    assert forms[:2] + forms[3:] == [parse(c) for i, c in enumerate(cells) if i != 2]
+    assert forms[2] == Form(
+        code=["%pip install foo"], title=None, params=[], markdowns=[], errors=[]
+    )
+    # The same options are shared
+    assert forms[0].params[0].options is forms[3].params[0].options
+    # Cached comments still give a param for each cell, and errors
+    assert forms[3].errors[0].error == "Value 200.0 not in range [0, 100]"
+    assert [len(f.errors) for f in forms[4:]] == [1, 1]
+
+
+def test_parse_many_syntax_error():
+    cells = ["%pip install foo\na = 1 # @param", "b = 1 # @param"]
+    forms = list(parse_many(cells))
+    assert forms[0].params == [] and forms[0].code == cells[0].splitlines()
+    assert [(e.lineno, e.code) for e in forms[0].errors] == [(1, "%pip install foo")]
+    assert "invalid syntax" in forms[0].errors[0].error
+    assert forms[1].params[0].variable == "b"
+
+
+def test_parse_many_streams():
+    def cells():
+        yield "a = 1 # @param"
+        raise RuntimeError("not consumed")
+
+    forms = parse_many(cells())
+    assert next(forms).params[0].variable == "a"
@@ -0,0 +1,113 @@
+import json
+import time
+import tracemalloc
+
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from ipyform import parser
+from ipyform.entities import Form
+
+# Time and memory allowed to parse one line, far above the actual cost of a valid line
+MAX_SECONDS = 0.5
+MAX_BYTES = 5_000_000
+
+TOKENS = ["{", "}", "[", "]", ",", ":", '"', "'", " ", "\\", "type", "slider", "min", "max"]
+TOKENS += ["step", "allow-input", "source", "string", "raw", "true", "1", "-2.5", "a", "é"]
+
+# Any single line of valid python source
+chars = st.characters(blacklist_categories=("Cc", "Cs", "Zl", "Zp"))
+comments = st.lists(st.sampled_from(TOKENS), max_size=200).map("".join) | st.text(
+    chars, max_size=300
+)
+
+# Well-formed configs with values of any type
+KEYS = ["type", "min", "max", "step", "allow-input", "source", "placeholder", "other"]
+values = st.recursive(
+    st.none() | st.booleans() | st.integers() | st.floats() | st.sampled_from(TOKENS),
+    lambda children: st.lists(children, max_size=3),
+    max_leaves=5,
+)
+TYPES = ["slider", "string", "raw", "number", "integer", "date", "boolean"]
+configs = st.builds(
+    lambda typ, config: json.dumps({"type": typ, **config}),
+    st.sampled_from(TYPES) | values,
+    st.dictionaries(st.sampled_from(KEYS), values, max_size=3),
+)
+comments |= st.tuples(st.none() | st.lists(values, max_size=3), configs).map(
+    lambda t: (json.dumps(t[0]) + " " if t[0] is not None else "") + t[1]
+)
+
+
+def _parse_line(line: str) -> Form:
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        form = parser.parse(line)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert time.perf_counter() - start < MAX_SECONDS
+    assert peak < MAX_BYTES
+    return form
+
+
+@settings(max_examples=300, deadline=None, derandomize=True)
+@given(comments, st.sampled_from(["1", "-0.5", "None", "'a'", "True", "[1]", "f(x)"]))
+def test_param_comment(comment, value):
+    form = _parse_line(f"x = {value} # @param {comment}")
+    assert len(form.params) + len(form.errors) == 1
+
+
+@settings(max_examples=100, deadline=None, derandomize=True)
+@given(comments)
+def test_title(comment):
+    _parse_line(f"# @title {comment}")
+
+
+@pytest.mark.parametrize(
+    "comment",
+    [
+        "{a: '" + "x}" * 10_000,  # one parse attempt per closing bracket
+        "[" * 5_000 + "]" * 5_000,  # deep nesting
+        "{" * 300 + "}" * 300,
+        '["a"] ' + "{" * 1_000,
+    ],
+)
+def test_pathological_comments(comment):
+    form = _parse_line(f"x = 1 # @param {comment}")
+    assert len(form.errors) == 1
+    form = _parse_line(f"# @title T {comment}")
+    assert form.title is not None
+
+
+def test_parse_attempts_are_bounded(monkeypatch):
+    calls = []
+    parse_js_object = parser.chompjs.parse_js_object
+    monkeypatch.setattr(
+        parser.chompjs, "parse_js_object", lambda s: calls.append(1) or parse_js_object(s)
+    )
+    n = 50
+    form = parser.parse("\n".join([f"x{i} = 1 # @param {{a: '" + "x}" * 400 for i in range(n)]))
+    assert len(form.errors) == n
+    assert len(calls) <= n * parser.MAX_PARSE_ATTEMPTS
+
+
+def test_long_option_lists():
+    options = [f"region-{i}" for i in range(5_000)]
+    form = parser.parse(f'r = "region-0" # @param {options}')
+    assert form.errors == [] and len(form.params[0].options) == 5_000
+
+
+def test_comment_too_long(monkeypatch):
+    monkeypatch.setattr(parser, "MAX_JSON_LENGTH", 10)
+    form = parser.parse("x = 1 # @param [1, 2, 3, 4, 5]")
+    assert form.errors[0].error == "Comment too long: 15 > 10 characters"
+
+
+def test_failed_comment_is_truncated_in_error():
+    form = parser.parse("x = 1 # @param {a: [" + "1," * 10_000 + "}}}")
+    error = form.errors[0].error
+    assert error.startswith("JSON parsing failed for: `{a: [1,1,")
+    assert len(error) < 2 * parser.MAX_QUOTED_LENGTH and error.endswith("…`")
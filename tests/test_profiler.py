@@ -0,0 +1,56 @@
+import contextlib
+import linecache
+import sys
+import traceback
+
+import pytest
+
+from ipyform import parser
+from ipyform.profiler import LineProfiler
+from ipyform.widgets import FormWidget
+
+CODE = """import time
+def slow():
+    time.sleep(0.05)
+for i in range(3):
+    x = i
+slow()
+"""
+
+
+def test_profile():
+    p = LineProfiler()
+    trace = sys.gettrace()
+    with p.trace():
+        exec(p.compile(CODE), {})
+    assert sys.gettrace() is trace
+
+    assert {k: s.hits for k, s in p.stats.items()} == {1: 1, 2: 1, 3: 1, 4: 4, 5: 3, 6: 1}
+    # Line 6 includes the time of the function it calls
+    assert p.stats[6].time >= p.stats[3].time >= 0.05
+    assert p.total >= p.stats[6].time
+
+    table = p.table(top=2)
+    assert table.count("<tr>") == 3 and table.index("slow()") < table.index("time.sleep")
+
+
+def test_traceback_shows_source():
+    p = LineProfiler()
+    with pytest.raises(ZeroDivisionError) as e:
+        with p.trace():
+            exec(p.compile("a = 1\nb = a / 0"), {})
+    assert "b = a / 0" in "".join(traceback.format_tb(e.tb))
+    assert p.stats[2].hits == 1
+    p.close()
+    assert p.filename not in linecache.cache
+
+
+def test_form_widget():
+    f = FormWidget(parser.parse("a = 1 # @param\nb = a * 2"), ns={}, profile=True)
+    assert f.children[0].children[-1] is f.profile_view
+    assert "<td>b = a * 2</td>" in f.profile_view.value
+    with contextlib.suppress(ZeroDivisionError):  # shown in the output when in IPython
+        f.fields[0].widget.value = "1 / 0"
+    assert "<td>a = 1 / 0</td>" in f.profile_view.value
+    f.close()
+    assert f.profiler.filename not in linecache.cache
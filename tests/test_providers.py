@@ -0,0 +1,163 @@
+import pytest
+
+from ipyform import parser, providers
+from ipyform.anywidget_form import AnyFormWidget
+from ipyform.entities import Param
+from ipyform.providers import MORE, OptionProvider, get_provider
+from ipyform.widgets import FormWidget
+
+from .test_widgets import get_by_desc
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(monkeypatch):
+    monkeypatch.setattr(providers, "_CACHE", {})
+
+
+def counting(n):
+    consumed = []
+
+    def gen():
+        for i in range(n):
+            consumed.append(i)
+            yield f"t{i}"
+
+    return gen, consumed
+
+
+def test_option_provider_pages():
+    gen, consumed = counting(5)
+    provider = OptionProvider(gen, page_size=2)
+    assert consumed == []
+    assert provider.fetch_page() == ["t0", "t1"]
+    assert len(consumed) == 2
+    assert provider.fetch_page() == ["t0", "t1", "t2", "t3"]
+    assert not provider.exhausted
+    assert provider.fetch_page() == ["t0", "t1", "t2", "t3", "t4"]
+    assert provider.exhausted
+    assert provider.fetch_page() == ["t0", "t1", "t2", "t3", "t4"]
+
+    provider = OptionProvider([1, 2, 3])
+    assert provider.fetch_page() == ["1", "2", "3"]
+
+
+def test_get_provider_cache():
+    def fn():
+        return ["a"]
+
+    ns = {"fn": fn, "it": iter(["a"])}
+    assert get_provider("missing", ns) is None
+    provider = get_provider("fn", ns)
+    assert get_provider("fn", ns) is provider
+    assert get_provider("fn", ns, ttl=-1) is not provider
+
+    ns["fn"] = lambda: ["b"]
+    assert get_provider("fn", ns).source is ns["fn"]
+
+    it = get_provider("it", ns)
+    assert get_provider("it", ns, ttl=-1) is it
+
+
+def test_parse_source():
+    form = parser.parse('a = "t1" # @param {type: "raw", source: "tables"}')
+    assert form.params[0] == Param(
+        code='a = "t1" # @param {type: "raw", source: "tables"}',
+        lineno=1,
+        field_type="dropdown",
+        var_type="raw",
+        variable="a",
+        value="t1",
+        source="tables",
+    )
+
+
+@pytest.mark.parametrize(
+    "code,error",
+    [
+        ('a = 1 # @param [1] {source: "tables"}', "either an options list or a source"),
+        ("a = 1 # @param {source: 1}", "source must be a name"),
+        ('a = 1 # @param {source: "t", type: "integer"}', "Dropdowns only support the following"),
+    ],
+)
+def test_parse_source_errors(code, error):
+    form = parser.parse(code)
+    assert error in form.errors[0].error
+
+
+def test_form_lazy_options(monkeypatch):
+    monkeypatch.setattr(providers, "PAGE_SIZE", 2)
+    gen, consumed = counting(3)
+    env = {"tables": gen, "n": 0}
+    cell = 'a = "t1" # @param {source: "tables"}\nn += 1'
+    f = FormWidget(parser.parse(cell), ns=env)
+    lazy = f.lazy_options["a"]
+    lazy.thread.join()
+    widget = get_by_desc(f, "a")
+    assert widget.options == ("t0", "t1", MORE)
+    assert (widget.value, env["n"]) == ("t1", 1)
+
+    widget.value = MORE
+    assert widget.options == ("t0", "t1", "t2")
+    assert (widget.value, env["n"]) == ("t1", 1)
+
+    widget.value = "t2"
+    assert (env["a"], env["n"]) == ("t2", 2)
+
+    # A new form with the same source reuses the loaded options
+    f = FormWidget(parser.parse(cell), ns=env)
+    assert get_by_desc(f, "a").options == ("t0", "t1", "t2")
+    assert f.lazy_options["a"].thread is None
+    assert len(consumed) == 3
+
+
+def test_form_lazy_options_value_not_in_options():
+    env = {"tables": ["t0"]}
+    f = FormWidget(parser.parse('a = "x" # @param {source: "tables"}'), ns=env)
+    f.lazy_options["a"].thread.join()
+    assert get_by_desc(f, "a").options == ("x", "t0")
+
+
+def test_form_missing_source(caplog):
+    env = {}
+    f = FormWidget(parser.parse('a = "x" # @param {source: "tables"}'), ns=env)
+    assert f.lazy_options == {}
+    assert env["a"] == "x"
+    assert "Options source `tables` not found" in caplog.text
+
+
+def test_anywidget_options():
+    env = {"tables": lambda: ["t0", "t1"]}
+    f = AnyFormWidget(parser.parse('a = "x" # @param {source: "tables"}'), ns=env)
+    # Rendered with the value only, then the options are loaded in the background
+    assert f.model.spec["sections"][0]["fields"][0]["options"] == ["x"]
+    f.options_thread.join()
+    assert f.model.options == {"a": ["x", "t0", "t1"]}
+
+    f = AnyFormWidget(parser.parse('a = "t1" # @param {source: "tables"}'), ns=env)
+    assert f.options_thread is None and f.model.options == {"a": ["t0", "t1"]}
+
+
+def failing():
+    yield "t0"
+    raise RuntimeError("db down")
+
+
+def test_failing_source(monkeypatch, caplog):
+    monkeypatch.setattr(providers, "PAGE_SIZE", 1)
+    env = {"tables": failing}
+    cell = 'a = "x" # @param {source: "tables"}'
+    f = FormWidget(parser.parse(cell), ns=env)
+    f.lazy_options["a"].thread.join()
+    widget = get_by_desc(f, "a")
+    assert widget.options == ("x", "t0", MORE)
+    widget.value = MORE
+    assert widget.options == ("x", "t0") and widget.value == "x"
+    assert "Options source `tables` failed. RuntimeError: db down" in caplog.text
+
+    env = {"tables": lambda: 1 / 0}
+    f = AnyFormWidget(parser.parse(cell), ns=env)
+    f.options_thread.join()
+    assert f.model.options == {"a": ["x"]} and env["a"] == "x"
+    # Failed calls are retried by the next form
+    assert providers._CACHE["tables"].error == "ZeroDivisionError: division by zero"
+    assert get_provider("tables", env).error is None
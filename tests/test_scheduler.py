@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from ipyform.scheduler import RerunScheduler
+
+
+class Form:
+    pass
+
+
+def run_in_thread(scheduler, form, fn):
+    t = threading.Thread(target=scheduler.submit, args=(form, fn))
+    t.start()
+    return t
+
+
+def blocked(scheduler):
+    """Starts a rerun that holds the only slot until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+
+    t = run_in_thread(scheduler, Form(), fn)
+    started.wait(5)
+    return t, release
+
+
+def test_serialized():
+    scheduler = RerunScheduler()
+    running, overlaps = [], []
+
+    def fn():
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.01)
+        running.pop()
+
+    threads = [run_in_thread(scheduler, Form(), fn) for _ in range(8)]
+    for t in threads:
+        t.join()
+    assert overlaps == [1] * 8
+    assert scheduler.stats()["completed"] == 8
+
+
+def test_max_concurrency():
+    scheduler = RerunScheduler(max_concurrency=2)
+    t, release = blocked(scheduler)
+    calls = []
+    scheduler.submit(Form(), lambda: calls.append(1))
+    assert calls == [1]
+    release.set()
+    t.join()
+
+
+def test_order_and_coalescing():
+    scheduler = RerunScheduler()
+    t, release = blocked(scheduler)
+    a, b, c, d = Form(), Form(), Form(), Form()
+    calls = []
+    scheduler.submit(a, lambda: calls.append("a1"))
+    scheduler.submit(b, lambda: calls.append("b"))
+    scheduler.submit(a, lambda: calls.append("a2"))
+    scheduler.submit(c, lambda: calls.append("c"), priority=1)
+    scheduler.submit(d, lambda: calls.append("d"))
+    scheduler.focus(d)
+    assert calls == []
+    assert scheduler.stats()["queue_depth"] == 4
+    assert scheduler.stats()["coalesced"] == 1
+
+    release.set()
+    t.join()
+    assert calls == ["d", "c", "a2", "b"]
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["wait_max"] > 0
+    assert stats["wait_avg"] <= stats["wait_max"]
+
+
+def test_fair():
+    scheduler = RerunScheduler()
+    a, b = Form(), Form()
+    scheduler.submit(a, lambda: None)
+    t, release = blocked(scheduler)
+    calls = []
+    scheduler.submit(a, lambda: calls.append("a"))
+    scheduler.submit(b, lambda: calls.append("b"))
+    release.set()
+    t.join()
+    # b was never served, so it goes before a
+    assert calls == ["b", "a"]
+
+
+def test_reentrant_submit():
+    scheduler = RerunScheduler()
+    calls = []
+
+    def outer():
+        scheduler.submit(Form(), lambda: calls.append("inner"))
+        calls.append("outer")
+
+    scheduler.submit(Form(), outer)
+    assert calls == ["outer", "inner"]
+
+
+def test_errors(caplog):
+    scheduler = RerunScheduler()
+    with pytest.raises(ZeroDivisionError):
+        scheduler.submit(Form(), lambda: 1 / 0)
+
+    t, release = blocked(scheduler)
+    scheduler.submit(Form(), lambda: 1 / 0)
+    release.set()
+    t.join()
+    assert "Rerun failed" in caplog.text
+    assert scheduler.stats()["running"] == 0
+
+
+def test_forget():
+    scheduler = RerunScheduler()
+    t, release = blocked(scheduler)
+    form, calls = Form(), []
+    scheduler.submit(form, lambda: calls.append(1))
+    scheduler.focus(form)
+    scheduler.forget(form)
+    assert scheduler.focused is None
+    release.set()
+    t.join()
+    assert calls == []
@@ -0,0 +1,130 @@
+import json
+import subprocess
+import sys
+
+from inline_snapshot import snapshot
+
+from ipyform import parser, specs
+from ipyform.specs import FieldSpec, form_specs, param_to_spec
+from ipyform.widgets import build_fields
+
+CELL = """
+a = 1 # @param {type: "integer"}
+b = "x" # @param ["x", "y"]
+c = "x" # @param ["x", "y"] {"allow-input": true}
+d = 0.5 # @param {type: "slider", min: 0, max: 1, step: 0.1}
+e = True # @param {type: "boolean"}
+f = "2024-01-30" # @param {type: "date"}
+"""
+
+
+def test_param_to_spec():
+    form = parser.parse(CELL)
+    assert [param_to_spec(p) for p in form.params] == snapshot(
+        [
+            FieldSpec(
+                variable="a",
+                lineno=2,
+                widget="IntText",
+                kwargs={"description": "a", "value": 1, "continuous_update": False},
+            ),
+            FieldSpec(
+                variable="b",
+                lineno=3,
+                widget="Dropdown",
+                kwargs={"description": "b", "value": "x", "options": ("x", "y")},
+            ),
+            FieldSpec(
+                variable="c",
+                lineno=4,
+                widget="Combobox",
+                kwargs={
+                    "description": "c",
+                    "value": "x",
+                    "options": ("x", "y"),
+                    "continuous_update": False,
+                },
+            ),
+            FieldSpec(
+                variable="d",
+                lineno=5,
+                widget="FloatSlider",
+                kwargs={
+                    "description": "d",
+                    "value": 0.5,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.1,
+                    "continuous_update": False,
+                },
+            ),
+            FieldSpec(
+                variable="e",
+                lineno=6,
+                widget="Checkbox",
+                kwargs={"description": "e", "value": True},
+            ),
+            FieldSpec(
+                variable="f",
+                lineno=7,
+                widget="DatePicker",
+                kwargs={"description": "f", "value": "2024-01-30"},
+            ),
+        ]
+    )
+
+
+def test_numeric_widgets():
+    cell = """a = 3 # @param {type: "slider", min: 0, max: 10, step: 1}
+b = 3 # @param {type: "slider", min: 0, max: 10, step: 0.5}
+c = 2 # @param {type: "number"}
+d = 0.1 # @param {type: "number"}
+e = 12345678901234567890 # @param {type: "integer"}
+f = 1e400 # @param {type: "number"}
+g = n + 1 # @param {type: "integer"}
+h = 1.5 # @param {type: "integer"}
+"""
+    out = [(s.widget, s.kwargs["value"]) for s in form_specs(parser.parse(cell))]
+    assert out == [
+        ("IntSlider", 3),
+        ("FloatSlider", 3.0),
+        ("FloatText", 2.0),  # passed to the cell as 2, see test_widgets
+        ("FloatText", 0.1),
+        ("Text", "12345678901234567890"),  # not exact in the browser
+        ("Text", "inf"),
+        ("Text", "n + 1"),
+        ("Text", "1.5"),
+    ]
+
+
+def test_serializable():
+    for spec in form_specs(parser.parse(CELL)):
+        assert FieldSpec.from_dict(json.loads(json.dumps(spec.to_dict()))) == spec
+
+
+def test_form_specs_cache(monkeypatch):
+    monkeypatch.setattr(specs, "_CACHE", type(specs._CACHE)())
+    monkeypatch.setattr(specs, "CACHE_SIZE", 2)
+    s1 = form_specs(parser.parse(CELL))
+    assert form_specs(parser.parse(CELL)) is s1
+
+    form_specs(parser.parse("a = 1 # @param"))
+    form_specs(parser.parse(CELL))
+    form_specs(parser.parse("a = 2 # @param"))
+    assert form_specs(parser.parse(CELL)) is s1
+    assert len(specs._CACHE) == 2
+
+
+def test_build_fields_share_layout_and_style():
+    fields = build_fields(parser.parse(CELL + 'g = 1 # @param {type: "integer"}'))
+    layouts = {id(f.widget.layout) for f in fields}
+    assert len(layouts) == 1
+    a, g = fields[0].widget, fields[-1].widget
+    assert a.style is g.style
+    assert type(a.style).__name__ == "DescriptionStyle"  # IntText
+    assert a.style.description_width == "150px"
+
+
+def test_no_ipywidgets_import():
+    code = "import sys; import ipyform.specs; assert 'ipywidgets' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,139 @@
+import math
+import multiprocessing
+import time
+
+import pytest
+from inline_snapshot import snapshot
+
+from ipyform import parser
+from ipyform.ipython_ext import form_sweep
+from ipyform.sweep import (
+    SweepResult,
+    grid,
+    param_domain,
+    random_samples,
+    results_table,
+    run_code,
+    run_sweep,
+)
+
+CELL = """
+a = "x" # @param ["x", "y"]
+b = 0 # @param {type: "slider", min: 0, max: 0.3, step: 0.1}
+c = True # @param {type: "boolean"}
+d = 5 # @param {type: "integer"}
+"""
+
+
+def test_param_domain():
+    form = parser.parse(CELL)
+    assert [param_domain(p) for p in form.params] == snapshot(
+        [['"""x"""', '"""y"""'], ["0.0", "0.1", "0.2", "0.3"], ["True", "False"], ["5"]]
+    )
+
+
+def test_param_domain_integer_slider():
+    p = parser.parse('a = 4 # @param {type: "slider", min: 0, max: 10, step: 2}').params[0]
+    assert param_domain(p) == ["0", "2", "4", "6", "8", "10"]  # as sent by the form
+
+
+def test_grid_and_random_samples():
+    form = parser.parse(CELL)
+    combinations = list(grid(form))
+    assert len(combinations) == 2 * 4 * 2
+    assert combinations[0] == {"a": '"""x"""', "b": "0.0", "c": "True", "d": "5"}
+
+    samples = list(random_samples(form, 5, seed=1))
+    assert len(samples) == 5
+    assert samples == list(random_samples(form, 5, seed=1))
+    assert all(s in combinations for s in samples)
+
+
+def test_run_code():
+    ns = {}
+    assert run_code("a = 1\na + 1", ns) == "2"
+    assert run_code("print(a)", ns) is None
+    assert run_code("", ns) is None
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_run_sweep(executor):
+    form = parser.parse(CELL + "print(a, b)\n(a, b, c, math.floor(d * k))")
+    ns = {"k": 2, "math": math}  # a notebook variable and import
+    results = list(run_sweep(form, grid(form), ns=ns, executor=executor, workers=3))
+    assert len(results) == 16
+    r = next(r for r in results if r.values["b"] == "0.2" and r.values["c"] == "False")
+    assert r.error is None
+    assert r.output == f"{r.values['a'][3]} 0.2\n"
+    assert r.result == repr((r.values["a"][3], 0.2, False, 10))
+
+
+def test_run_sweep_does_not_mutate_ns():
+    form = parser.parse("a = 1 # @param [1, 2] {type: 'raw'}\nacc.append(a)\nb = a")
+    ns = {"acc": []}
+    results = list(run_sweep(form, grid(form), ns=ns, workers=1))
+    assert [r.error for r in results] == [None, None]
+    assert sorted(ns["acc"]) == [1, 2]
+    assert "b" not in ns
+
+
+def test_run_sweep_timeout_and_stop():
+    # Threads can't be stopped: runs with a timeout are made in worker processes
+    before = set(multiprocessing.active_children())
+    form = parser.parse("a = 0 # @param [0, 1, 2, 3] {type: 'raw'}\nimport time\ntime.sleep(a)")
+    start = time.monotonic()
+    results = list(run_sweep(form, grid(form), workers=2, timeout=0.5))
+    assert time.monotonic() - start < 2
+    assert {r.values["a"]: r.error for r in results} == snapshot(
+        {
+            "0": None,
+            "1": "TimeoutError: exceeded 0.5s",
+            "2": "TimeoutError: exceeded 0.5s",
+            "3": "TimeoutError: exceeded 0.5s",
+        }
+    )
+    assert set(multiprocessing.active_children()) <= before
+
+    form = parser.parse("a = 0 # @param [0, 1, 2, 3] {type: 'raw'}\n1 / (a - 1)")
+    results = list(run_sweep(form, grid(form), workers=1, stop=lambda r: r.error is not None))
+    assert [r.values["a"] for r in results] == ["0", "1"]
+    assert results[-1].error == "ZeroDivisionError: division by zero"
+
+
+def test_run_sweep_process_workers_are_killed():
+    before = set(multiprocessing.active_children())
+    form = parser.parse("a = 0 # @param [0, 1] {type: 'raw'}\nwhile a:\n    pass\na")
+    results = list(run_sweep(form, grid(form), executor="process", workers=2, timeout=0.5))
+    assert {r.values["a"]: (r.result, r.error) for r in results} == {
+        "0": ("0", None),
+        "1": (None, "TimeoutError: exceeded 0.5s"),
+    }
+    assert set(multiprocessing.active_children()) <= before
+
+    # Stopped early: the run in progress is killed too
+    form = parser.parse("a = 0 # @param [0, 1, 2] {type: 'raw'}\n1 / a\nwhile True:\n    pass")
+    stop = lambda r: r.error is not None  # noqa: E731
+    results = list(run_sweep(form, grid(form), executor="process", workers=2, stop=stop))
+    assert [r.values["a"] for r in results] == ["0"]
+    assert set(multiprocessing.active_children()) <= before
+
+
+def test_results_table():
+    form = parser.parse(CELL)
+    results = [SweepResult({"a": '"""<x>"""', "b": "0.1", "c": "True", "d": "5"}, "out\n", "1")]
+    assert results_table(form, results) == snapshot(
+        """\
+<table><tr><th>a</th><th>b</th><th>c</th><th>result</th><th>output</th><th>error</th><th>time (s)</th></tr><tr><td>&quot;&quot;&quot;&lt;x&gt;&quot;&quot;&quot;</td><td>0.1</td><td>True</td><td>1</td><td>out
+</td><td></td><td>0.000</td></tr></table>\
+"""
+    )
+
+
+def test_form_sweep_magic():
+    ns = {"acc": []}
+    form_sweep("--mode random -n 5 --seed 0 --workers 2", CELL + "acc.append(b)", local_ns=ns)
+    assert len(ns["acc"]) == 5
+
+    ns = {"acc": []}
+    form_sweep("--max-runs 3 --stop-on-error", CELL + "acc.append(b)", local_ns=ns)
+    assert ns["acc"] == [0.0, 0.0, 0.1]
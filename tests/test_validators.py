@@ -0,0 +1,60 @@
+import pytest
+
+from ipyform import parser
+from ipyform.anywidget_form import AnyFormWidget
+from ipyform.validators import compile_validator
+from ipyform.widgets import FormWidget
+
+from .test_widgets import get_by_desc
+
+
+@pytest.mark.parametrize(
+    "cell,valid,invalid",
+    [
+        ('a = 1 # @param {type: "integer"}', ["2", " -3 ", 10**30], ["1.5", "a", ""]),
+        ('a = 1 # @param {type: "number"}', ["2", "1e-3", "-1.5"], ["a", "1,5"]),
+        ('a = 1 # @param {type: "raw"}', ["a + 1", "[1, 2]"], ["a +", "import os"]),
+        ('a = 1 / 3 # @param {type: "number"}', ["2 / 3", "x", "1.5"], ["2 /"]),
+        ('b = a + 1 # @param {type: "integer"}', ["a + 2", "3"], ["a +"]),
+        ('a = 1 # @param {type: "string"}', ["", "a +"], []),
+        ('a = 1 # @param [1, 2] {type: "raw"}', ["1", 2], ["3", ""]),
+        ('a = 3 # @param [1, 2] {type: "raw", "allow-input": true}', ["3", "f(1)"], ["f("]),
+        ('a = 3 # @param [1, 2] {"allow-input": true}', ["f("], []),
+        ('a = 1 # @param {type: "slider", min: 0, max: 2}', [0, 2, "1.5"], [-1, 2.1, "a", None]),
+    ],
+)
+def test_compile_validator(cell, valid, invalid):
+    validate = compile_validator(parser.parse(cell).params[0])
+    for v in valid:
+        assert validate(v) is None
+    for v in invalid:
+        assert validate(v)
+
+
+def test_invalid_value_is_not_run():
+    # Too large for an IntText: edited as text
+    cell = 'a = 10000000000000000001 # @param {type: "integer"}\nb = 2 # @param {type: "number"}\nn += 1'
+    env = {"n": 0}
+    f = FormWidget(parser.parse(cell), ns=env)
+    assert (env["a"], env["n"]) == (10**19 + 1, 1)
+
+    get_by_desc(f, "a").value = "x +"
+    get_by_desc(f, "b").value = "3"
+    assert (env["a"], env["b"], env["n"]) == (10**19 + 1, 2, 1)
+    assert f.message.value == (
+        '<span style="color: red">a: &#x27;x +&#x27; is not a valid python expression</span>'
+    )
+
+    get_by_desc(f, "a").value = "5"
+    assert (env["a"], env["b"], env["n"]) == (5, 3.0, 2)
+    assert f.message.value == ""
+
+
+def test_invalid_delta_is_not_run():
+    env = {}
+    f = AnyFormWidget(parser.parse('a = 1 # @param [1, 2] {type: "raw"}'), ns=env)
+    f.update_values({"a": "3"})
+    assert env["a"] == 1
+    assert "a: &#x27;3&#x27; is not one of the options" in f.message.value
+    f.update_values({"a": "2"})
+    assert env["a"] == 2
@@ -1,12 +1,15 @@
+import asyncio
 import re
+import threading
 from datetime import date
 from unittest.mock import patch
 
 import pytest
 from inline_snapshot import snapshot
+from ipywidgets.widgets.widget import _instances
 
 from ipyform import env, parser
-from ipyform.widgets import FormWidget
+from ipyform.widgets import BaseFormWidget, FormWidget, descendants, live_forms, state_size
 
 
 @pytest.mark.parametrize(
@@ -74,14 +77,215 @@ b = a + 1 # @param {type: integer}
     if not in_vscode:
         f_str = f_str.replace(id_[0], "myid")
         assert f_str == snapshot(
-            "FormWidget(children=(VBox(children=(HTML(value='<button onClick=\"code_toggle(\\'myid\\')\" id=\"myid\">Hide/Show Code</button>'), HTML(value='<h2>MyTitle</h2>'), HTML(value='<h3>subtitle</h3>'), Box(children=(Text(value='2', continuous_update=False, description='a', layout=Layout(width='400px'), placeholder='', style=TextStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), HTML(value='<h3>subtitle2</h3>'), Box(children=(Text(value='a + 1', continuous_update=False, description='b', layout=Layout(width='400px'), placeholder='', style=TextStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), Output())),))"
+            "FormWidget(children=(VBox(children=(HTML(value='<button onClick=\"code_toggle(\\'myid\\')\" id=\"myid\">Hide/Show Code</button>'), HTML(value='<h2>MyTitle</h2>'), HTML(value='<h3>subtitle</h3>'), Box(children=(IntText(value=2, description='a', layout=Layout(width='400px'), style=DescriptionStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), HTML(value='<h3>subtitle2</h3>'), Box(children=(Text(value='a + 1', continuous_update=False, description='b', layout=Layout(width='400px'), placeholder='', style=TextStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), HTML(value=''), Output())),))"
         )
     else:
         assert f_str == snapshot(
-            "FormWidget(children=(VBox(children=(HTML(value=''), HTML(value='<h2>MyTitle</h2>'), HTML(value='<h3>subtitle</h3>'), Box(children=(Text(value='2', continuous_update=False, description='a', layout=Layout(width='400px'), placeholder='', style=TextStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), HTML(value='<h3>subtitle2</h3>'), Box(children=(Text(value='a + 1', continuous_update=False, description='b', layout=Layout(width='400px'), placeholder='', style=TextStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), Output())),))"
+            "FormWidget(children=(VBox(children=(HTML(value=''), HTML(value='<h2>MyTitle</h2>'), HTML(value='<h3>subtitle</h3>'), Box(children=(IntText(value=2, description='a', layout=Layout(width='400px'), style=DescriptionStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), HTML(value='<h3>subtitle2</h3>'), Box(children=(Text(value='a + 1', continuous_update=False, description='b', layout=Layout(width='400px'), placeholder='', style=TextStyle(description_width='150px')),), layout=Layout(display='grid', grid_template_columns='auto auto auto')), HTML(value=''), Output())),))"
         )
 
 
+@pytest.mark.parametrize(
+    "cell,value,exp",
+    [
+        ('a = 1 # @param {type: "integer"}', "9007199254740991", 2**53 - 1),
+        (
+            'a = 12345678901234567890 # @param {type: "integer"}',
+            "12345678901234567891",
+            12345678901234567891,
+        ),
+        ('a = 0.5 # @param {type: "number"}', 0.1 + 0.2, 0.1 + 0.2),
+        ('a = 0.5 # @param {type: "number"}', 1e-320, 1e-320),
+        ('a = 1 # @param {type: "slider", min: 0, max: 1, step: 0.1}', 0.7, 0.7),
+    ],
+)
+def test_numeric_precision(cell, value, exp):
+    env = {}
+    f = FormWidget(parser.parse(cell), ns=env)
+    f.fields[0].widget.value = value
+    assert env["a"] == exp and type(env["a"]) is type(exp)
+    f.close()
+
+
+def test_native_values():
+    cell = """a = 2 # @param {type: "integer"}
+b = 0.5 # @param {type: "number"}
+c = 5 # @param {type: "slider", min: 0, max: 10}
+d = a * b + c
+"""
+    env = {}
+    f = FormWidget(parser.parse(cell), ns=env)
+    assert [type(f.widget).__name__ for f in f.fields] == ["IntText", "FloatText", "IntSlider"]
+    assert f.code_values() == {}
+    assert f.native_values() == {"a": 2, "b": 0.5, "c": 5}
+    assert (env["c"], env["d"]) == (5, 6.0) and type(env["c"]) is int
+    f.fields[2].widget.value = 7
+    assert env["d"] == 8.0
+    f.close()
+
+
+def test_number_input_with_integer_literal():
+    cell = 'n = 3 # @param {type: "number"}\nout = [i for i in range(n)] if n == int(n) else n'
+    env = {}
+    f = FormWidget(parser.parse(cell), ns=env)
+    assert env["out"] == [0, 1, 2] and type(env["n"]) is int
+    f.fields[0].widget.value = 2.5
+    assert env["out"] == 2.5
+    f.fields[0].widget.value = 4.0
+    assert env["out"] == [0, 1, 2, 3]
+    f.close()
+
+
+def test_update():
+    cell = """# @title T
+a = 1 # @param {type: "integer"}
+b = "x" # @param ["x", "y", "z"]
+# @markdown Section
+c = 0.5 # @param {type: "slider", min: 0, max: 1, step: 0.1}
+d = True # @param {type: "boolean"}
+print(a, b, c)
+"""
+    ns = {}
+    f = FormWidget(parser.parse(cell), ns=ns)
+    a, b, c, d = (get_by_desc(f, k) for k in "abcd")
+    a.value, b.value, d.value = "5", "z", False
+    box, md = f._boxes[0], f._html["<p>Section</p>"]
+
+    new = cell.replace("0.5 #", "2.5 #").replace('"y", "z"', '"z"').replace("= True", "= False")
+    new = new.replace("max: 1,", "min: 2, max: 3,").replace("# @title T", "x = 0 # @param")
+    f.update(parser.parse(new))
+
+    # Kept: a. Patched: b, c, d. Added: x
+    assert get_by_desc(f, "a") is a and a.value == 5
+    assert get_by_desc(f, "b") is b and (b.options, b.value) == (("x", "z"), "z")
+    assert get_by_desc(f, "c") is c and (c.min, c.max, c.value) == (2, 3, 2.5)
+    assert get_by_desc(f, "d") is d and d.value is False
+    assert get_by_desc(f, "x").value == "0"
+    assert f._boxes[0] is box and f._html["<p>Section</p>"] is md
+    assert "<h2>T</h2>" not in str(f)
+    assert (ns["a"], ns["b"], ns["c"], ns["x"]) == (5, "z", 2.5, 0)
+
+    a.value = "6"
+    assert ns["a"] == 6
+
+    # Value not in the new options: reset to the value of the code
+    f.update(parser.parse(new.replace('["x", "z"]', '["x"]')))
+    assert (b.options, b.value) == (("x",), "x")
+    # Another widget type: replaced
+    f.update(parser.parse(new.replace('"integer"', '"slider"')))
+    assert get_by_desc(f, "a") is not a and a.comm is None
+    assert ns["a"] == 1.0
+
+
+def test_update_with_invalid_value_is_not_run():
+    cell = "a = 1 # @param\nn += 1"
+    ns = {"n": 0}
+    f = FormWidget(parser.parse(cell), ns=ns)
+    get_by_desc(f, "a").value = "a +"  # rejected
+    assert ns["n"] == 1 and "a: " in f.message.value
+    f.update(parser.parse(cell.replace("n += 1", "n += 2")))
+    assert ns["n"] == 1 and "a: " in f.message.value
+    get_by_desc(f, "a").value = "3"
+    assert (ns["a"], ns["n"]) == (3, 3)
+    f.close()
+
+
+def test_update_with_expression_values():
+    cell = "a = 1/3 # @param {type: 'number'}\nb = a + 1 # @param {type: 'integer'}\nn += 1"
+    ns = {"n": 0}
+    f = FormWidget(parser.parse(cell), ns=ns)
+    assert ns["n"] == 1
+    f.update(parser.parse(cell.replace("n += 1", "n += 2")))
+    assert (ns["a"], ns["b"], ns["n"]) == (1 / 3, 1 / 3 + 1, 3)
+    assert f.message.value == ""
+    f.close()
+
+
+def test_base_form_defaults():
+    class PlainForm(BaseFormWidget):
+        def __init__(self, data, ns):
+            self._setup(data, ns, output_mode="full", max_output_lines=200)
+            super().__init__([self.output])
+            self._rerun(None)
+
+    ns = {}
+    f = PlainForm(parser.parse("a = 1 # @param\nb = a + 1"), ns=ns)
+    assert (ns["a"], ns["b"]) == (1, 2)  # values written in the cell
+    f.close()
+
+
+def test_close():
+    n_instances = len(_instances)
+    f = FormWidget(parser.parse(CELL_CLOSE), ns={"x": 1})
+    widgets = descendants(f)
+    assert f in live_forms()
+    assert len(widgets) == len(_instances) - n_instances
+    assert state_size(f) > 1000
+
+    f.close()
+    assert len(_instances) == n_instances
+    assert all(x.comm is None for x in widgets)
+    assert f not in live_forms()
+    assert f.ns == {} and f.output.outputs == ()
+
+
+def test_rerun_on_submit():
+    ns = {}
+    f = FormWidget(parser.parse("a = 1 # @param\nb = 2 # @param"), ns=ns, rerun="on-submit")
+    button, label = f.toolbar.children
+    assert ns == {"a": 1, "b": 2}
+
+    get_by_desc(f, "b").value = "4"
+    get_by_desc(f, "a").value = "3"
+    assert (ns["a"], ns["b"]) == (1, 2)
+    assert label.value == "Pending changes: a, b"
+
+    button.click()
+    assert (ns["a"], ns["b"]) == (3, 4)
+    assert f.pending == set() and label.value == ""
+
+    # Invalid value: not run
+    get_by_desc(f, "a").value = "x"
+    button.click()
+    assert ns["a"] == 3
+    f.close()
+
+
+def test_rerun_on_idle():
+    ns = {}
+    f = FormWidget(parser.parse("a = 1 # @param"), ns=ns, rerun="on-idle", idle_delay=0.05)
+    with patch.object(f, "_execute", wraps=f._execute) as execute:
+        for v in "234":
+            get_by_desc(f, "a").value = v
+        assert ns["a"] == 1 and f.toolbar.children[0].value == "Pending changes: a"
+        f._timer.join()
+        assert execute.call_count == 1
+    assert ns["a"] == 4 and f.pending == set()
+    f.close()
+
+
+def test_rerun_on_idle_in_event_loop():
+    ns = {}
+    cell = "import threading\na = 1 # @param\nthread = threading.current_thread()"
+    f = FormWidget(parser.parse(cell), ns=ns, rerun="on-idle", idle_delay=0.05)
+
+    async def edit():
+        get_by_desc(f, "a").value = "2"
+        await asyncio.sleep(0.2)
+
+    asyncio.run(edit())
+    assert ns["a"] == 2 and ns["thread"] is threading.main_thread()
+    f.close()
+
+
+CELL_CLOSE = """# @title T
+a = 1 # @param [1, 2] {type: "raw"}
+# @markdown Section
+b = True # @param {type: "boolean"}
+print(a)
+"""
+
+
 def get_by_desc(elt, desc):
     def recursive(elt, desc):
         if getattr(elt, "description", None) == desc: